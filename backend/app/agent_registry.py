@@ -0,0 +1,82 @@
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, MutableMapping
+from datetime import datetime
+from pathlib import Path
+import orjson
+from app.schemas import AgentStatus
+from config.settings import get_settings
+
+settings = get_settings()
+
+class SQLiteAgentRegistry(MutableMapping):
+    """Agent registry stored in SQLite so every server worker sees the same agents."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # sqlite3 connections must stay on the thread that opened them
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS agents (agent_id TEXT PRIMARY KEY, data BLOB NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _decode(self, data: bytes) -> Dict[str, Any]:
+        """Restore the typed fields of a stored agent record."""
+        agent = orjson.loads(data)
+        agent['status'] = AgentStatus(agent['status'])
+        agent['registration_timestamp'] = datetime.fromisoformat(agent['registration_timestamp'])
+        return agent
+
+    def __getitem__(self, agent_id: str) -> Dict[str, Any]:
+        row = self._connection().execute(
+            "SELECT data FROM agents WHERE agent_id = ?", (agent_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(agent_id)
+        return self._decode(row[0])
+
+    def __setitem__(self, agent_id: str, agent_data: Dict[str, Any]) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO agents (agent_id, data) VALUES (?, ?)",
+                (agent_id, orjson.dumps(agent_data))
+            )
+
+    def __delitem__(self, agent_id: str) -> None:
+        with self._connection() as conn:
+            if conn.execute("DELETE FROM agents WHERE agent_id = ?", (agent_id,)).rowcount == 0:
+                raise KeyError(agent_id)
+
+    def __contains__(self, agent_id: object) -> bool:
+        return self._connection().execute(
+            "SELECT 1 FROM agents WHERE agent_id = ?", (agent_id,)
+        ).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._connection().execute("SELECT agent_id FROM agents").fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM agents").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM agents")
+
+def create_agent_registry() -> MutableMapping[str, Dict[str, Any]]:
+    """Create the agent registry selected by the agent_registry_backend setting."""
+    if settings.agent_registry_backend == "sqlite":
+        return SQLiteAgentRegistry(settings.database_url.replace("sqlite:///", "", 1))
+    return {}
@@ -1,92 +1,226 @@
-from typing import Dict, List, Any, Optional
+import re
+import json
+import time
+from functools import lru_cache
+from operator import attrgetter
+from types import MappingProxyType
+from collections import Counter, OrderedDict, defaultdict, deque
+from typing import Deque, Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from app.violation_checker import violation_checker
 from app.schemas import (
     EnforcementAction, ViolationDetail, ViolationSeverity, 
     EnforcementDecisionResponse, ActionType
 )
+from config.settings import get_settings
+
+settings = get_settings()
+
+# Number of enforcement records kept per agent
+_MAX_HISTORY_PER_AGENT = 100
+
+# C-level field accessors for mapping over violation lists
+_get_severity = attrgetter('severity')
+_get_violation_type = attrgetter('violation_type')
+
+# Keyword groups in classification priority order
+_ACTION_TYPE_KEYWORDS = (
+    (ActionType.DATA_ACCESS, ('read', 'access', 'view', 'get')),
+    (ActionType.SYSTEM_MODIFICATION, ('modify', 'update', 'delete', 'create', 'write')),
+    (ActionType.USER_INTERACTION, ('user', 'interact', 'message', 'notify')),
+    (ActionType.EXTERNAL_API_CALL, ('api', 'external', 'call', 'request')),
+)
+
+# Single-pass matcher: one group per action type, wrapped in a lookahead so
+# overlapping keywords are still seen. The lowest matching group wins.
+_ACTION_TYPE_PATTERN = re.compile('(?=' + '|'.join(
+    '(' + '|'.join(map(re.escape, keywords)) + ')'
+    for _, keywords in _ACTION_TYPE_KEYWORDS
+) + ')')
+_ACTION_TYPES_BY_GROUP = tuple(action_type for action_type, _ in _ACTION_TYPE_KEYWORDS)
+
+# Reasoning appended to the violation summary for each decision
+_REASONING_SUFFIXES = MappingProxyType({
+    EnforcementAction.WARN: "Action permitted with warning.",
+    EnforcementAction.BLOCK: "Action blocked due to policy violations.",
+    EnforcementAction.SUSPEND: "Agent suspended due to critical violations.",
+})
+
+# Base constraints for each decision; copied before violation-specific keys are added
+_DECISION_CONSTRAINTS = MappingProxyType({
+    EnforcementAction.WARN: MappingProxyType({
+        'monitoring_required': True,
+        'report_required': True,
+    }),
+    EnforcementAction.BLOCK: MappingProxyType({
+        'action_blocked': True,
+        'retry_allowed': False,
+        'escalation_required': True,
+    }),
+    EnforcementAction.SUSPEND: MappingProxyType({
+        'agent_suspended': True,
+        'manual_review_required': True,
+        'suspension_duration_hours': 24,
+    }),
+})
+
+def _context_key(context: Dict[str, Any]) -> Any:
+    """Build a hashable, order-independent key for a decision context.
+
+    Flat contexts of hashable values (the common case) use their items
+    directly; nested ones fall back to canonical JSON. None if neither works.
+    """
+    try:
+        return frozenset(context.items())
+    except TypeError:
+        pass
+    try:
+        return json.dumps(context, sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        return None
+
+@lru_cache(maxsize=4096)
+def _match_action_type(proposed_action: str) -> ActionType:
+    """Classify an action description; agents reuse a small set of descriptions."""
+    best_group = None
+    for match in _ACTION_TYPE_PATTERN.finditer(proposed_action.lower()):
+        group = match.lastindex
+        if group == 1:
+            return _ACTION_TYPES_BY_GROUP[0]
+        if best_group is None or group < best_group:
+            best_group = group
+
+    if best_group is None:
+        return ActionType.DATA_ACCESS  # Default fallback
+    return _ACTION_TYPES_BY_GROUP[best_group - 1]
 
 class Enforcer:
     def __init__(self):
         self.violation_checker = violation_checker
-        self.enforcement_history: Dict[str, List[Dict[str, Any]]] = {}
+        self.enforcement_history: Dict[str, Deque[Dict[str, Any]]] = defaultdict(
+            lambda: deque(maxlen=_MAX_HISTORY_PER_AGENT)
+        )
+        # Decision counts over all retained history, kept in step with enforcement_history
+        self._decision_counts: Counter = Counter()
+        # (agent_id, policy_epoch, proposed_action, context, hour)
+        #   -> (expires_at, policy activity window, violations)
+        self._violation_cache: Dict[Tuple[Any, ...],
+                                    Tuple[float, Tuple[datetime, datetime], List[ViolationDetail]]] = OrderedDict()
 
     def make_enforcement_decision(self, agent_id: str, proposed_action: str, 
-                                context: Dict[str, Any]) -> EnforcementDecisionResponse:
+                                context: Dict[str, Any],
+                                now: Optional[datetime] = None) -> EnforcementDecisionResponse:
         """Make an enforcement decision based on policy violations."""
+        if now is None:
+            now = datetime.now()
 
-        # Determine action type from proposed action
-        action_type = self._classify_action_type(proposed_action)
+        # Check for violations (classification + policy checks are cached)
+        violations = self._get_violations(agent_id, proposed_action, context, now)
 
-        # Check for violations
-        violations = self.violation_checker.check_action_compliance(
-            agent_id, action_type, proposed_action, context
-        )
+        # Tally severities once for decision and constraint generation
+        severity_counts = Counter(map(_get_severity, violations))
 
         # Determine enforcement action based on violations
-        decision = self._determine_enforcement_action(violations, agent_id)
+        decision = self._determine_enforcement_action(violations, agent_id, severity_counts, now)
 
         # Generate reasoning
         reasoning = self._generate_reasoning(decision, violations)
 
         # Record enforcement decision
-        self._record_enforcement_decision(agent_id, decision, violations, proposed_action)
+        self._record_enforcement_decision(agent_id, decision, violations, proposed_action, now)
 
         # Prepare additional constraints if needed
-        additional_constraints = self._generate_constraints(decision, violations, context)
+        additional_constraints = self._generate_constraints(decision, violations, context,
+                                                            severity_counts)
 
         return EnforcementDecisionResponse(
             decision=decision,
             agent_id=agent_id,
             reasoning=reasoning,
             violations=violations,
-            timestamp=datetime.now(),
+            timestamp=now,
             additional_constraints=additional_constraints
         )
 
+    def _get_violations(self, agent_id: str, proposed_action: str,
+                        context: Dict[str, Any],
+                        now: Optional[datetime] = None) -> List[ViolationDetail]:
+        """Get policy violations for an action, reusing recent results.
+
+        Only the stateless part of the pipeline is cached. Escalation based on
+        the agent's enforcement history is always recomputed by the caller.
+        Entries are keyed on the policy epoch, so policy uploads invalidate them,
+        and on the hour, which time restriction rules check. An entry is only
+        served while now is inside the policy activity window it was computed
+        in, so policies taking effect or expiring (or an explicit earlier now)
+        are never answered from a stale result.
+        """
+        if now is None:
+            now = datetime.now()
+
+        context_key = _context_key(context)
+
+        cache_key = None
+        if context_key is not None:
+            policy_loader = self.violation_checker.policy_loader
+            cache_key = (agent_id, policy_loader.policy_epoch, proposed_action, context_key, now.hour)
+            cached = self._violation_cache.get(cache_key)
+            if cached is not None:
+                expires_at, (window_start, window_end), violations = cached
+                if expires_at > time.monotonic() and window_start <= now < window_end:
+                    self._violation_cache.move_to_end(cache_key)
+                    return list(violations)
+                del self._violation_cache[cache_key]
+
+        # Determine action type from proposed action
+        action_type = self._classify_action_type(proposed_action)
+
+        violations = self.violation_checker.check_action_compliance(
+            agent_id, action_type, proposed_action, context, now
+        )
+
+        if cache_key is not None and settings.decision_cache_max_entries > 0:
+            self._violation_cache[cache_key] = (
+                time.monotonic() + settings.decision_cache_ttl_seconds,
+                policy_loader.get_activity_window(now),
+                list(violations)
+            )
+            if len(self._violation_cache) > settings.decision_cache_max_entries:
+                self._violation_cache.popitem(last=False)
+
+        return violations
+
     def _classify_action_type(self, proposed_action: str) -> ActionType:
         """Classify the type of action based on the description."""
-        action_lower = proposed_action.lower()
-
-        if any(keyword in action_lower for keyword in ['read', 'access', 'view', 'get']):
-            return ActionType.DATA_ACCESS
-        elif any(keyword in action_lower for keyword in ['modify', 'update', 'delete', 'create', 'write']):
-            return ActionType.SYSTEM_MODIFICATION
-        elif any(keyword in action_lower for keyword in ['user', 'interact', 'message', 'notify']):
-            return ActionType.USER_INTERACTION
-        elif any(keyword in action_lower for keyword in ['api', 'external', 'call', 'request']):
-            return ActionType.EXTERNAL_API_CALL
-        else:
-            return ActionType.DATA_ACCESS  # Default fallback
+        return _match_action_type(proposed_action)
 
     def _determine_enforcement_action(self, violations: List[ViolationDetail], 
-                                    agent_id: str) -> EnforcementAction:
+                                    agent_id: str,
+                                    severity_counts: Optional[Counter] = None,
+                                    now: Optional[datetime] = None) -> EnforcementAction:
         """Determine the appropriate enforcement action based on violations."""
         if not violations:
             return EnforcementAction.ALLOW
 
+        if severity_counts is None:
+            severity_counts = Counter(map(_get_severity, violations))
+
         # Check for critical violations
-        critical_violations = [v for v in violations if v.severity == ViolationSeverity.CRITICAL]
-        if critical_violations:
+        if severity_counts[ViolationSeverity.CRITICAL]:
             return EnforcementAction.SUSPEND
 
         # Check for high severity violations
-        high_violations = [v for v in violations if v.severity == ViolationSeverity.HIGH]
-        if high_violations:
+        if severity_counts[ViolationSeverity.HIGH]:
             return EnforcementAction.BLOCK
 
-        # Check agent's violation history
-        agent_history = self.enforcement_history.get(agent_id, [])
-        recent_violations = [
-            entry for entry in agent_history 
-            if (datetime.now() - entry['timestamp']).days <= 7
-        ]
-
-        # If agent has recent violations, escalate enforcement
-        if len(recent_violations) >= 3:
-            return EnforcementAction.BLOCK
-        elif len(recent_violations) >= 1:
-            return EnforcementAction.WARN
+        # Check agent's violation history. History is in time order, so the
+        # agent has 3+ recent decisions exactly when the third newest is recent.
+        agent_history = self.enforcement_history.get(agent_id, ())
+        if len(agent_history) >= 3:
+            if now is None:
+                now = datetime.now()
+            if (now - agent_history[-3]['timestamp']).days <= 7:
+                return EnforcementAction.BLOCK
 
         # For medium and low violations, warn by default
         return EnforcementAction.WARN
@@ -97,79 +231,64 @@ class Enforcer:
         if decision == EnforcementAction.ALLOW:
             return "No policy violations detected. Action is permitted."
 
-        violation_summary = []
-        for violation in violations:
-            violation_summary.append(f"{violation.severity.value} {violation.violation_type}")
-
-        base_reason = f"Detected violations: {', '.join(violation_summary)}. "
-
-        if decision == EnforcementAction.WARN:
-            return base_reason + "Action permitted with warning."
-        elif decision == EnforcementAction.BLOCK:
-            return base_reason + "Action blocked due to policy violations."
-        elif decision == EnforcementAction.SUSPEND:
-            return base_reason + "Agent suspended due to critical violations."
+        violation_summary = ', '.join(
+            f"{violation.severity.value} {violation.violation_type}" for violation in violations
+        )
 
-        return base_reason
+        return f"Detected violations: {violation_summary}. " + _REASONING_SUFFIXES.get(decision, "")
 
     def _record_enforcement_decision(self, agent_id: str, decision: EnforcementAction, 
-                                   violations: List[ViolationDetail], proposed_action: str):
+                                   violations: List[ViolationDetail], proposed_action: str,
+                                   now: Optional[datetime] = None):
         """Record the enforcement decision for future reference."""
-        if agent_id not in self.enforcement_history:
-            self.enforcement_history[agent_id] = []
-
         record = {
-            'timestamp': datetime.now(),
+            'timestamp': now if now is not None else datetime.now(),
             'decision': decision.value,
             'violations_count': len(violations),
             'proposed_action': proposed_action,
-            'violation_types': [v.violation_type for v in violations]
+            'violation_types': list(map(_get_violation_type, violations))
         }
 
-        self.enforcement_history[agent_id].append(record)
-
-        # Keep only last 100 records per agent
-        if len(self.enforcement_history[agent_id]) > 100:
-            self.enforcement_history[agent_id] = self.enforcement_history[agent_id][-100:]
+        # Bounded deque keeps only the most recent records per agent
+        agent_history = self.enforcement_history[agent_id]
+        if len(agent_history) == agent_history.maxlen:
+            self._decision_counts[agent_history[0]['decision']] -= 1
+        agent_history.append(record)
+        self._decision_counts[record['decision']] += 1
 
     def _generate_constraints(self, decision: EnforcementAction, violations: List[ViolationDetail], 
-                            context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+                            context: Dict[str, Any],
+                            severity_counts: Optional[Counter] = None) -> Optional[Dict[str, Any]]:
         """Generate additional constraints based on the enforcement decision."""
         if decision == EnforcementAction.ALLOW:
             return None
 
-        constraints = {}
-
-        if decision == EnforcementAction.WARN:
-            constraints['monitoring_required'] = True
-            constraints['report_required'] = True
-
-        elif decision == EnforcementAction.BLOCK:
-            constraints['action_blocked'] = True
-            constraints['retry_allowed'] = False
-            constraints['escalation_required'] = True
-
-        elif decision == EnforcementAction.SUSPEND:
-            constraints['agent_suspended'] = True
-            constraints['manual_review_required'] = True
-            constraints['suspension_duration_hours'] = 24
+        constraints = dict(_DECISION_CONSTRAINTS.get(decision, {}))
 
         # Add violation-specific constraints
-        for violation in violations:
-            if violation.severity == ViolationSeverity.CRITICAL:
-                constraints['immediate_notification'] = True
-            elif violation.severity == ViolationSeverity.HIGH:
-                constraints['supervisor_notification'] = True
+        if severity_counts is None:
+            severity_counts = Counter(map(_get_severity, violations))
+        if severity_counts[ViolationSeverity.CRITICAL]:
+            constraints['immediate_notification'] = True
+        if severity_counts[ViolationSeverity.HIGH]:
+            constraints['supervisor_notification'] = True
 
         return constraints if constraints else None
 
+    def reset(self):
+        """Forget all enforcement history and cached violation results."""
+        self.enforcement_history.clear()
+        self._decision_counts.clear()
+        self._violation_cache.clear()
+
     def get_agent_enforcement_history(self, agent_id: str) -> List[Dict[str, Any]]:
         """Get enforcement history for a specific agent."""
-        return self.enforcement_history.get(agent_id, [])
+        return list(self.enforcement_history.get(agent_id, ()))
 
     def get_enforcement_statistics(self) -> Dict[str, Any]:
         """Get overall enforcement statistics."""
-        total_decisions = sum(len(history) for history in self.enforcement_history.values())
+        decisions_by_type = {decision: count for decision, count in self._decision_counts.items() if count}
+        total_decisions = sum(decisions_by_type.values())
 
         if total_decisions == 0:
             return {
@@ -178,12 +297,6 @@ class Enforcer:
                 'agents_with_violations': 0
             }
 
-        decisions_by_type = {}
-        for history in self.enforcement_history.values():
-            for record in history:
-                decision = record['decision']
-                decisions_by_type[decision] = decisions_by_type.get(decision, 0) + 1
-
         return {
             'total_decisions': total_decisions,
             'decisions_by_type': decisions_by_type,
@@ -1,41 +1,100 @@
+import atexit
 import logging
+import logging.handlers
 import json
-from typing import Dict, Any, Optional
-from datetime import datetime
+import queue
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from itertools import chain, count
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
+from datetime import datetime, timedelta
 from pathlib import Path
 from config.settings import get_settings
 
 settings = get_settings()
 
+def _insert_by_time(timestamps: List[datetime], logs: List[Dict[str, Any]],
+                    action_log: Dict[str, Any]):
+    """Insert an action log into a pair of parallel time-ordered lists."""
+    timestamp = action_log['timestamp']
+    if not timestamps or timestamp >= timestamps[-1]:
+        timestamps.append(timestamp)
+        logs.append(action_log)
+    else:
+        # Clock went backwards; keep the index sorted
+        position = bisect_right(timestamps, timestamp)
+        timestamps.insert(position, timestamp)
+        logs.insert(position, action_log)
+
 class GaaSLogger:
     def __init__(self):
+        self._log_listener: Optional[logging.handlers.QueueListener] = None
         self.setup_logging()
         self.action_logs: Dict[str, Dict[str, Any]] = {}
-        self.log_counter = 0
+        # Action logs ordered by timestamp, for range queries
+        self._log_timestamps: List[datetime] = []
+        self._logs_by_time: List[Dict[str, Any]] = []
+        # The same ordering per agent, so per-agent reports skip other agents' logs
+        self._agent_log_index: Dict[str, Tuple[List[datetime], List[Dict[str, Any]]]] = defaultdict(
+            lambda: ([], [])
+        )
+        self._next_retention_check = datetime.min
+        # next() on itertools.count is atomic, so concurrent requests never share an ID
+        self._log_sequence = count(1)
 
     def setup_logging(self):
-        """Setup logging configuration."""
+        """Setup logging configuration.
+
+        Records are handed to a queue on the request path; file and console
+        output happen on a background listener thread.
+        """
         log_level = getattr(logging, settings.log_level.upper(), logging.INFO)
+        self.logger = logging.getLogger('GaaS-Backend')
+
+        root_logger = logging.getLogger()
+        if root_logger.handlers:
+            # Already configured (same contract as logging.basicConfig)
+            return
 
         # Create logs directory if it doesn't exist
         log_path = Path(settings.log_file).parent
         log_path.mkdir(exist_ok=True)
 
-        # Configure logging
-        logging.basicConfig(
-            level=log_level,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(settings.log_file),
-                logging.StreamHandler()
-            ]
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        file_handler = logging.handlers.RotatingFileHandler(
+            settings.log_file,
+            maxBytes=settings.log_max_bytes,
+            backupCount=settings.log_backup_count
         )
+        stream_handler = logging.StreamHandler()
+        for handler in (file_handler, stream_handler):
+            handler.setFormatter(formatter)
 
-        self.logger = logging.getLogger('GaaS-Backend')
+        log_queue: queue.Queue = queue.Queue(-1)
+        root_logger.setLevel(log_level)
+        root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+        self._log_listener = logging.handlers.QueueListener(
+            log_queue, file_handler, stream_handler, respect_handler_level=True
+        )
+        self._log_listener.start()
+        atexit.register(self.stop_logging)
+
+    def stop_logging(self):
+        """Flush queued log records and stop the background listener."""
+        if self._log_listener is not None:
+            self._log_listener.stop()
+            self._log_listener = None
 
-    def log_agent_registration(self, agent_id: str, registration_data: Dict[str, Any], 
+    def log_agent_registration(self, agent_id: str,
+                             registration_data: Union[Dict[str, Any], Callable[[], Dict[str, Any]]],
                              success: bool, message: str):
-        """Log agent registration events."""
+        """Log agent registration events.
+
+        registration_data may be a zero-argument callable; it is only invoked
+        when the log entry payload is actually written.
+        """
         log_entry = {
             'event_type': 'agent_registration',
             'agent_id': agent_id,
@@ -53,8 +112,14 @@ class GaaSLogger:
         self._store_log_entry(log_entry)
 
     def log_action_submission(self, agent_id: str, action_data: Dict[str, Any], 
-                            log_id: str, violations: list):
-        """Log action submission events."""
+                            log_id: str, violations: list, now: Optional[datetime] = None):
+        """Log action submission events.
+
+        now is the time the caller already read for this request, if any; the
+        log entry and the indexed action log share it.
+        """
+        if now is None:
+            now = datetime.now()
         log_entry = {
             'event_type': 'action_submission',
             'agent_id': agent_id,
@@ -62,7 +127,7 @@ class GaaSLogger:
             'action_data': action_data,
             'violations_detected': len(violations),
             'violations': [str(v) for v in violations],
-            'timestamp': datetime.now().isoformat()
+            'timestamp': now.isoformat()
         }
 
         if violations:
@@ -73,16 +138,97 @@ class GaaSLogger:
         self._store_log_entry(log_entry)
 
         # Store in action logs for compliance reporting
-        self.action_logs[log_id] = {
+        action_log = {
             'agent_id': agent_id,
             'action_data': action_data,
             'violations': violations,
-            'timestamp': datetime.now(),
+            'violation_types': tuple(getattr(v, 'violation_type', 'unknown') for v in violations),
+            'timestamp': now,
             'log_id': log_id
         }
+        self.action_logs[log_id] = action_log
+        self._index_action_log(action_log)
+        self._evict_action_logs(action_log['timestamp'])
+
+    def _index_action_log(self, action_log: Dict[str, Any]):
+        """Insert an action log into the global and per-agent time-ordered indexes."""
+        _insert_by_time(self._log_timestamps, self._logs_by_time, action_log)
+        agent_timestamps, agent_logs = self._agent_log_index[action_log['agent_id']]
+        _insert_by_time(agent_timestamps, agent_logs, action_log)
+
+    def _evict_action_logs(self, now: datetime):
+        """Drop action logs past the retention window or over the size limit.
+
+        Evicted logs are appended to the archive file as JSON lines so reports
+        over older periods can still be reconstructed offline.
+        """
+        evict_count = 0
+
+        # Retention sweeps are cheap but only needed once a minute
+        if now >= self._next_retention_check:
+            cutoff = now - timedelta(days=settings.compliance_report_retention_days)
+            evict_count = bisect_left(self._log_timestamps, cutoff)
+            self._next_retention_check = now + timedelta(minutes=1)
+
+        # Evict in batches of 10% so the list shifts are amortized
+        overflow = len(self._logs_by_time) - settings.max_action_logs
+        if overflow > 0:
+            evict_count = max(evict_count, overflow + settings.max_action_logs // 10)
+
+        if evict_count == 0:
+            return
+
+        evicted = self._logs_by_time[:evict_count]
+        del self._logs_by_time[:evict_count]
+        del self._log_timestamps[:evict_count]
+        for action_log in evicted:
+            self.action_logs.pop(action_log['log_id'], None)
+
+        # Evicted logs are the oldest overall, so they are also the oldest per agent
+        for agent_id, agent_count in Counter(log['agent_id'] for log in evicted).items():
+            agent_timestamps, agent_logs = self._agent_log_index[agent_id]
+            del agent_timestamps[:agent_count]
+            del agent_logs[:agent_count]
+            if not agent_logs:
+                del self._agent_log_index[agent_id]
+
+        self._archive_action_logs(evicted)
+
+    def _archive_action_logs(self, action_logs: List[Dict[str, Any]]):
+        """Append action logs to the archive file as JSON lines.
+
+        A relative archive path is taken relative to the log file's directory.
+        """
+        if not settings.action_log_archive_file:
+            return
+
+        archive_file = Path(settings.log_file).parent / settings.action_log_archive_file
+        try:
+            with open(archive_file, 'a') as f:
+                for action_log in action_logs:
+                    record = {
+                        'log_id': action_log['log_id'],
+                        'agent_id': action_log['agent_id'],
+                        'timestamp': action_log['timestamp'].isoformat(),
+                        'action_data': action_log['action_data'],
+                        'violations': [
+                            v.model_dump(mode='json') if hasattr(v, 'model_dump') else str(v)
+                            for v in action_log['violations']
+                        ]
+                    }
+                    f.write(json.dumps(record, default=str) + '\n')
+        except OSError as e:
+            self.logger.error(f"Failed to archive {len(action_logs)} action logs: {e}")
+
+    def clear_action_logs(self):
+        """Drop all in-memory action logs and their indexes, without archiving them."""
+        self.action_logs.clear()
+        self._log_timestamps.clear()
+        self._logs_by_time.clear()
+        self._agent_log_index.clear()
 
     def log_enforcement_decision(self, agent_id: str, decision: str, violations: list, 
-                               reasoning: str):
+                               reasoning: str, now: Optional[datetime] = None):
         """Log enforcement decisions."""
         log_entry = {
             'event_type': 'enforcement_decision',
@@ -90,7 +236,7 @@ class GaaSLogger:
             'decision': decision,
             'violations_count': len(violations),
             'reasoning': reasoning,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': (now or datetime.now()).isoformat()
         }
 
         self.logger.info(f"Enforcement decision made: {agent_id} - {decision}")
@@ -149,44 +295,43 @@ class GaaSLogger:
     def _store_log_entry(self, log_entry: Dict[str, Any]):
         """Store log entry for potential retrieval."""
         # This could be extended to store in a database
-        # For now, we just ensure it's logged to file
-        pass
+        # For now, full payloads are only written to the log at debug level
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+
+        payload = {key: value() if callable(value) else value for key, value in log_entry.items()}
+        self.logger.debug(f"Log entry: {json.dumps(payload, default=str)}")
 
     def generate_log_id(self) -> str:
-        """Generate a unique log ID."""
-        self.log_counter += 1
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        return f"LOG_{timestamp}_{self.log_counter:06d}"
+        """Generate a unique log ID, sortable by creation time."""
+        return f"LOG_{time.time_ns():016x}_{next(self._log_sequence):x}"
 
     def get_action_logs_for_period(self, start_date: datetime, end_date: datetime, 
                                   agent_id: Optional[str] = None) -> list:
         """Get action logs for a specific period."""
-        filtered_logs = []
-
-        for log_id, log_data in self.action_logs.items():
-            log_timestamp = log_data['timestamp']
-
-            # Check if log is within the specified period
-            if start_date <= log_timestamp <= end_date:
-                # Check if agent filter applies
-                if agent_id is None or log_data['agent_id'] == agent_id:
-                    filtered_logs.append(log_data)
+        if agent_id is None:
+            timestamps, logs = self._log_timestamps, self._logs_by_time
+        elif agent_id in self._agent_log_index:
+            timestamps, logs = self._agent_log_index[agent_id]
+        else:
+            return []
 
-        return filtered_logs
+        start = bisect_left(timestamps, start_date)
+        end = bisect_right(timestamps, end_date, lo=start)
+        return logs[start:end]
 
     def get_violation_statistics(self, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
         """Get violation statistics for a period."""
         logs = self.get_action_logs_for_period(start_date, end_date)
 
+        violation_counts = [len(log['violation_types']) for log in logs]
         total_actions = len(logs)
-        total_violations = sum(len(log['violations']) for log in logs)
-        compliant_actions = sum(1 for log in logs if not log['violations'])
-
-        violation_types = {}
-        for log in logs:
-            for violation in log['violations']:
-                violation_type = getattr(violation, 'violation_type', 'unknown')
-                violation_types[violation_type] = violation_types.get(violation_type, 0) + 1
+        total_violations = sum(violation_counts)
+        compliant_actions = violation_counts.count(0)
+
+        violation_types = dict(Counter(chain.from_iterable(
+            log['violation_types'] for log in logs
+        )))
 
         return {
             'total_actions': total_actions,
@@ -1,7 +1,11 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Any
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ValidationError
+from contextlib import asynccontextmanager
+from typing import Dict, Any, MutableMapping
 import uuid
+import orjson
 from datetime import datetime, timedelta
 
 from app.schemas import (
@@ -10,21 +14,32 @@ from app.schemas import (
     EnforcementDecisionRequest, EnforcementDecisionResponse,
     PolicyUploadRequest, PolicyUploadResponse,
     ComplianceReportRequest, ComplianceReportResponse, ComplianceMetrics,
+    BatchRequest, BatchResponse, BatchOperationResult,
     ErrorResponse
 )
 from app.policy_loader import policy_loader
 from app.violation_checker import violation_checker
 from app.enforcer import enforcer
 from app.logger import gaas_logger
+from app.agent_registry import create_agent_registry
 from config.settings import get_settings
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown hooks."""
+    yield
+    # Flush pending log records before the process exits
+    gaas_logger.stop_logging()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Governance-as-a-Service (GaaS) Backend",
     description="A comprehensive governance system for AI agents",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -40,8 +55,16 @@ app.add_middleware(
 def get_app_settings():
     return get_settings()
 
-# In-memory storage for registered agents (in production, use a database)
-registered_agents: Dict[str, Dict[str, Any]] = {}
+def _model_response(model: BaseModel) -> Response:
+    """Serialize a response model to JSON in pydantic-core.
+
+    Returning a Response skips FastAPI's dump/re-validate/encode pass over the
+    model; the route's response_model still documents the schema.
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+# Registered agents: in-memory by default, SQLite-backed when shared across workers
+registered_agents: MutableMapping[str, Dict[str, Any]] = create_agent_registry()
 
 @app.get("/")
 async def root():
@@ -54,7 +77,8 @@ async def root():
             "/submit_action_log", 
             "/enforcement_decision",
             "/upload_policy",
-            "/compliance_report"
+            "/compliance_report",
+            "/batch"
         ]
     }
 
@@ -117,7 +141,7 @@ async def register_agent(request: AgentRegistrationRequest, settings = Depends(g
     except Exception as e:
         gaas_logger.log_agent_registration(
             request.agent_id, 
-            request.dict(), 
+            request.model_dump, 
             False, 
             str(e)
         )
@@ -145,12 +169,16 @@ async def submit_action_log(request: ActionLogRequest):
                 detail=f"Agent {request.agent_id} is not active"
             )
 
+        # One clock read for the policy checks and the log entry
+        now = datetime.now()
+
         # Check for policy violations
         violations = violation_checker.check_action_compliance(
             request.agent_id,
             request.action_type,
             request.action_description,
-            request.context
+            request.context,
+            now=now
         )
 
         # Generate log ID
@@ -159,19 +187,20 @@ async def submit_action_log(request: ActionLogRequest):
         # Log the action
         gaas_logger.log_action_submission(
             request.agent_id,
-            request.dict(),
+            request.model_dump(),
             log_id,
-            violations
+            violations,
+            now=now
         )
 
         violation_messages = [f"{v.violation_type}: {v.description}" for v in violations]
 
-        return ActionLogResponse(
+        return _model_response(ActionLogResponse(
             success=True,
             log_id=log_id,
             message="Action log submitted successfully",
             violations_detected=violation_messages
-        )
+        ))
 
     except HTTPException:
         raise
@@ -181,13 +210,59 @@ async def submit_action_log(request: ActionLogRequest):
             detail=f"Internal server error during action log submission: {str(e)}"
         )
 
+def _make_enforcement_decision(agent_id: str, proposed_action: str,
+                               context: Dict[str, Any]) -> Response:
+    """Decide on and log a proposed action for a registered agent."""
+    # One clock read for the decision, its history record and the log entry
+    now = datetime.now()
+
+    # Make enforcement decision
+    decision_response = enforcer.make_enforcement_decision(
+        agent_id,
+        proposed_action,
+        context,
+        now=now
+    )
+
+    # Log the enforcement decision
+    gaas_logger.log_enforcement_decision(
+        agent_id,
+        decision_response.decision.value,
+        decision_response.violations,
+        decision_response.reasoning,
+        now=now
+    )
+
+    return _model_response(decision_response)
+
+@app.post("/enforcement_decision", response_model=EnforcementDecisionResponse)
+async def post_enforcement_decision(request: EnforcementDecisionRequest):
+    """Provide enforcement decisions to agents, with context sent as a JSON body."""
+    try:
+        # Verify agent is registered
+        if request.agent_id not in registered_agents:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Agent {request.agent_id} is not registered"
+            )
+
+        return _make_enforcement_decision(request.agent_id, request.proposed_action, request.context)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error during enforcement decision: {str(e)}"
+        )
+
 @app.get("/enforcement_decision", response_model=EnforcementDecisionResponse)
 async def get_enforcement_decision(
     agent_id: str,
     proposed_action: str,
     context: str = "{}"  # JSON string of context
 ):
-    """Provide enforcement decisions to agents."""
+    """Provide enforcement decisions to agents (query-string variant of the POST endpoint)."""
     try:
         # Verify agent is registered
         if agent_id not in registered_agents:
@@ -197,31 +272,15 @@ async def get_enforcement_decision(
             )
 
         # Parse context
-        import json
         try:
-            context_dict = json.loads(context) if context else {}
-        except json.JSONDecodeError:
+            context_dict = orjson.loads(context) if context else {}
+        except orjson.JSONDecodeError:
             raise HTTPException(
                 status_code=400,
                 detail="Invalid JSON format for context parameter"
             )
 
-        # Make enforcement decision
-        decision_response = enforcer.make_enforcement_decision(
-            agent_id,
-            proposed_action,
-            context_dict
-        )
-
-        # Log the enforcement decision
-        gaas_logger.log_enforcement_decision(
-            agent_id,
-            decision_response.decision.value,
-            decision_response.violations,
-            decision_response.reasoning
-        )
-
-        return decision_response
+        return _make_enforcement_decision(agent_id, proposed_action, context_dict)
 
     except HTTPException:
         raise
@@ -288,7 +347,7 @@ async def upload_policy(request: PolicyUploadRequest):
     except Exception as e:
         gaas_logger.log_policy_upload(
             request.policy_id,
-            request.dict(),
+            request.model_dump(),
             False,
             [str(e)]
         )
@@ -384,6 +443,69 @@ async def get_compliance_report(
             detail=f"Internal server error during compliance report generation: {str(e)}"
         )
 
+# Operations accepted by /batch: name -> (request model, handler)
+_BATCH_OPERATIONS = {
+    "register_agent": (AgentRegistrationRequest,
+                       lambda request: register_agent(request, get_app_settings())),
+    "submit_action_log": (ActionLogRequest, submit_action_log),
+    "enforcement_decision": (EnforcementDecisionRequest, post_enforcement_decision),
+    "upload_policy": (PolicyUploadRequest, upload_policy),
+}
+
+@app.post("/batch", response_model=BatchResponse)
+async def run_batch(request: BatchRequest):
+    """Run several operations in one request.
+
+    Operations run in order through the same handlers as their own endpoints,
+    so later operations see earlier ones (e.g. a registration). A failing
+    operation reports its status code and error detail without stopping the batch.
+    """
+    results = []
+    for operation in request.operations:
+        if operation.op not in _BATCH_OPERATIONS:
+            results.append(BatchOperationResult(
+                op=operation.op, status_code=400,
+                body={"detail": f"Unknown batch operation: {operation.op}"}
+            ))
+            continue
+
+        request_model, handler = _BATCH_OPERATIONS[operation.op]
+        try:
+            response = await handler(request_model.model_validate(operation.payload))
+        except ValidationError as e:
+            results.append(BatchOperationResult(
+                op=operation.op, status_code=422,
+                body={"detail": e.errors(include_url=False, include_context=False)}
+            ))
+            continue
+        except HTTPException as e:
+            results.append(BatchOperationResult(
+                op=operation.op, status_code=e.status_code, body={"detail": e.detail}
+            ))
+            continue
+
+        # Handlers return either a pre-serialized Response or a response model
+        if isinstance(response, Response):
+            body = orjson.loads(response.body)
+        else:
+            body = response.model_dump(mode="json")
+        results.append(BatchOperationResult(op=operation.op, status_code=200, body=body))
+
+    return _model_response(BatchResponse(results=results))
+
+if get_settings().enable_test_endpoints:
+    @app.post("/_test/reset", include_in_schema=False)
+    async def reset_state():
+        """Clear registered agents, enforcement history and action logs.
+
+        Lets a test run start from a clean state without re-importing the app.
+        Policies are left in place, since they live in policy storage.
+        """
+        registered_agents.clear()
+        enforcer.reset()
+        gaas_logger.clear_action_logs()
+        return {"status": "reset"}
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -392,10 +514,13 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "registered_agents": len(registered_agents),
-        "active_policies": len(policy_loader.get_all_policies())
+        "active_policies": policy_loader.get_policy_count()
     }
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
     settings = get_settings()
-    uvicorn.run(app, host=settings.host, port=settings.port, reload=settings.debug)
+    # uvloop and httptools ship with uvicorn[standard]; uvloop is not available on Windows
+    uvicorn.run(app, host=settings.host, port=settings.port, reload=settings.debug,
+                loop="asyncio" if sys.platform == "win32" else "uvloop", http="httptools")
@@ -1,32 +1,138 @@
-import json
 import os
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import sys
+import logging
+import sqlite3
+import orjson
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Any, Set, Tuple
+from datetime import datetime, timedelta
 from pathlib import Path
+from types import MappingProxyType
 from config.settings import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Threads used to read policy files concurrently at startup
+_POLICY_READ_WORKERS = 32
+
+# Candidate lists memoised per (agent_id, action_type) before the memo is reset
+_MAX_CANDIDATE_PLANS = 10000
+
+# Top-level fields every stored policy must have
+_REQUIRED_POLICY_FIELDS = frozenset(('policy_id', 'policy_name', 'policy_type', 'policy_content', 'version'))
+
+def _read_bytes(path: str) -> bytes:
+    """Read a whole file as bytes."""
+    with open(path, 'rb') as f:
+        return f.read()
+
+def _parse_policy_date(value: Any) -> Optional[datetime]:
+    """Convert a stored effective/expiry date to a datetime (None if unset)."""
+    if value and isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value or None
+
+def _scope_keys(scope: Any) -> List[str]:
+    """Index keys for an agent or action-type scope; '*' if it may match anything."""
+    if not scope or not isinstance(scope, (list, tuple)) or '*' in scope:
+        return ['*']
+    return [sys.intern(key) for key in scope if isinstance(key, str)]
 
 class PolicyLoader:
+    __slots__ = ('policy_storage_path', '_policy_db_path', '_policies_cache', '_policy_windows', '_active_cache',
+                 '_activity_boundaries',
+                 '_policy_order', '_policies_by_type', '_policies_by_agent',
+                 '_policies_by_action_type', '_candidate_plans', 'policy_epoch')
+
     def __init__(self):
         self.policy_storage_path = Path(settings.policy_storage_path)
-        self.policy_storage_path.mkdir(exist_ok=True)
-        self._policies_cache: Dict[str, Dict[str, Any]] = {}
+        # Set when policies live in one SQLite table instead of one file each
+        self._policy_db_path: Optional[str] = None
+        if settings.policy_storage_backend == "sqlite":
+            self._policy_db_path = settings.database_url.replace("sqlite:///", "", 1)
+            Path(self._policy_db_path).parent.mkdir(parents=True, exist_ok=True)
+            with closing(self._connect_policy_db()) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS policies (policy_id TEXT PRIMARY KEY, data BLOB NOT NULL)"
+                )
+        else:
+            self.policy_storage_path.mkdir(exist_ok=True)
+        # Cached policies are read-only views, so callers can't change them behind the indexes
+        self._policies_cache: Dict[str, Mapping[str, Any]] = {}
+        # Parsed (effective_date, expiry_date) per policy, so activity checks don't re-parse
+        self._policy_windows: Dict[str, Tuple[Optional[datetime], Optional[datetime]]] = {}
+        # policy_id -> (is active, span [start, end) in which that answer holds)
+        self._active_cache: Dict[str, Tuple[bool, datetime, datetime]] = {}
+        # Sorted times at which some policy becomes active or lapses; rebuilt after policy changes
+        self._activity_boundaries: Optional[List[datetime]] = None
+        # Policy ids by type, agent scope and action-type scope ('*' = unscoped),
+        # plus each policy's load order so lookups return policies in cache order
+        self._policy_order: Dict[str, int] = {}
+        self._policies_by_type: Dict[str, Set[str]] = {}
+        self._policies_by_agent: Dict[str, Set[str]] = {}
+        self._policies_by_action_type: Dict[str, Set[str]] = {}
+        # (agent_id, action_type) -> candidate policies, reset whenever a policy changes
+        self._candidate_plans: Dict[Tuple[str, str], Tuple[Tuple[str, Mapping[str, Any]], ...]] = {}
+        # Bumped on every policy change so derived caches can detect staleness
+        self.policy_epoch = 0
         self._load_all_policies()
 
+    def _connect_policy_db(self) -> sqlite3.Connection:
+        """Open a connection to the policy database.
+
+        Policies are read once at startup and written only on upload, so a
+        short-lived connection per operation is enough.
+        """
+        conn = sqlite3.connect(self._policy_db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
     def _load_all_policies(self) -> None:
         """Load all policies from storage into memory cache."""
         try:
-            for policy_file in self.policy_storage_path.glob("*.json"):
-                with open(policy_file, 'r') as f:
-                    policy_data = json.load(f)
-                    policy_id = policy_data.get('policy_id')
-                    if policy_id:
-                        self._policies_cache[policy_id] = policy_data
-        except Exception as e:
-            print(f"Error loading policies: {e}")
-
-    def load_policy(self, policy_id: str) -> Optional[Dict[str, Any]]:
+            if self._policy_db_path is not None:
+                with closing(self._connect_policy_db()) as conn:
+                    policies = [row[0] for row in conn.execute("SELECT data FROM policies ORDER BY rowid")]
+                self._cache_stored_policies(policies)
+                return
+
+            # scandir's cached entry types avoid a stat (and a Path object) per file
+            with os.scandir(self.policy_storage_path) as entries:
+                policy_files = [entry.path for entry in entries
+                                if entry.name.endswith('.json') and not entry.name.startswith('.')
+                                and entry.is_file()]
+            if not policy_files:
+                return
+
+            # File reads release the GIL, so overlap them; parsing stays in directory order
+            with ThreadPoolExecutor(max_workers=min(_POLICY_READ_WORKERS, len(policy_files))) as executor:
+                self._cache_stored_policies(executor.map(_read_bytes, policy_files))
+        except Exception:
+            logger.exception("Error loading policies")
+
+    def _cache_stored_policies(self, stored_policies: Iterable[bytes]) -> None:
+        """Parse stored policy documents and add them to the cache.
+
+        A policy whose dates can't be parsed is logged and skipped, so it
+        doesn't keep the policies stored after it from loading.
+        """
+        for policy_bytes in stored_policies:
+            policy_data = orjson.loads(policy_bytes)
+            policy_id = policy_data.get('policy_id')
+            if policy_id:
+                try:
+                    policy_window = self._parse_policy_window(policy_data)
+                except (ValueError, TypeError) as e:
+                    logger.error("Skipping policy %s with invalid dates: %s", policy_id, e)
+                    continue
+                self._policy_windows[policy_id] = policy_window
+                self._set_cached_policy(policy_id, policy_data)
+
+    def load_policy(self, policy_id: str) -> Optional[Mapping[str, Any]]:
         """Load a specific policy by ID."""
         return self._policies_cache.get(policy_id)
 
@@ -41,55 +147,156 @@ class PolicyLoader:
             if not self._validate_policy_structure(policy_data):
                 return False
 
-            # Save to file
-            policy_file = self.policy_storage_path / f"{policy_id}.json"
-            with open(policy_file, 'w') as f:
-                json.dump(policy_data, f, indent=2, default=str)
+            # Parse dates up front so malformed ones are rejected before saving
+            policy_window = self._parse_policy_window(policy_data)
+
+            # Save to storage
+            if self._policy_db_path is not None:
+                with closing(self._connect_policy_db()) as conn, conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO policies (policy_id, data) VALUES (?, ?)",
+                        (policy_id, orjson.dumps(policy_data, default=str, option=orjson.OPT_NON_STR_KEYS))
+                    )
+            else:
+                # Indented files are easier to read while debugging but larger and slower to write
+                option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if settings.debug else 0)
+                policy_file = self.policy_storage_path / f"{policy_id}.json"
+                with open(policy_file, 'wb') as f:
+                    f.write(orjson.dumps(policy_data, default=str, option=option))
 
             # Update cache
-            self._policies_cache[policy_id] = policy_data
+            self._policy_windows[policy_id] = policy_window
+            self._active_cache.pop(policy_id, None)
+            self._set_cached_policy(policy_id, policy_data)
+            self.policy_epoch += 1
             return True
-        except Exception as e:
-            print(f"Error saving policy {policy_id}: {e}")
+        except Exception:
+            logger.exception("Error saving policy %s", policy_id)
             return False
 
+    def _set_cached_policy(self, policy_id: str, policy_data: Dict[str, Any]) -> None:
+        """Store a policy in the cache and keep the lookup indexes in step."""
+        previous = self._policies_cache.get(policy_id)
+        if previous is not None:
+            self._update_indexes(policy_id, previous, set.discard)
+        else:
+            self._policy_order[policy_id] = len(self._policy_order)
+
+        # Copy first so the caller's dict can't change the cached policy either
+        policy_view = MappingProxyType(dict(policy_data))
+        self._policies_cache[policy_id] = policy_view
+        self._update_indexes(policy_id, policy_view, set.add)
+        self._candidate_plans.clear()
+        self._activity_boundaries = None
+
+    def _update_indexes(self, policy_id: str, policy_data: Mapping[str, Any],
+                        update: Callable[[Set[str], str], None]) -> None:
+        """Add a policy id to (or discard it from) every index bucket the policy belongs to."""
+        policy_content = policy_data.get('policy_content', {})
+        buckets = [self._policies_by_type.setdefault(policy_data.get('policy_type'), set())]
+        buckets += [self._policies_by_agent.setdefault(key, set())
+                    for key in _scope_keys(policy_content.get('agent_scope', []))]
+        buckets += [self._policies_by_action_type.setdefault(key, set())
+                    for key in _scope_keys(policy_content.get('action_types', []))]
+        for bucket in buckets:
+            update(bucket, policy_id)
+
+    def _in_cache_order(self, policy_ids: Set[str]) -> List[str]:
+        """Order policy ids the way they appear in the cache."""
+        return sorted(policy_ids, key=self._policy_order.__getitem__)
+
+    def _parse_policy_window(self, policy_data: Dict[str, Any]) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Parse the dates that bound when a policy is active."""
+        return (_parse_policy_date(policy_data.get('effective_date')),
+                _parse_policy_date(policy_data.get('expiry_date')))
+
     def _validate_policy_structure(self, policy_data: Dict[str, Any]) -> bool:
         """Validate that policy has required structure."""
-        required_fields = ['policy_id', 'policy_name', 'policy_type', 'policy_content', 'version']
-        return all(field in policy_data for field in required_fields)
+        return _REQUIRED_POLICY_FIELDS <= policy_data.keys()
+
+    def get_all_policies(self) -> Mapping[str, Mapping[str, Any]]:
+        """Get a read-only view of all loaded policies."""
+        return MappingProxyType(self._policies_cache)
 
-    def get_all_policies(self) -> Dict[str, Dict[str, Any]]:
-        """Get all loaded policies."""
-        return self._policies_cache.copy()
+    def get_policy_count(self) -> int:
+        """Get the number of loaded policies."""
+        return len(self._policies_cache)
 
-    def get_policies_by_type(self, policy_type: str) -> List[Dict[str, Any]]:
+    def get_policies_by_type(self, policy_type: str) -> List[Mapping[str, Any]]:
         """Get all policies of a specific type."""
-        return [
-            policy for policy in self._policies_cache.values()
-            if policy.get('policy_type') == policy_type
-        ]
-
-    def is_policy_active(self, policy_id: str) -> bool:
-        """Check if a policy is currently active."""
-        policy = self.load_policy(policy_id)
-        if not policy:
+        policy_ids = self._policies_by_type.get(policy_type, set())
+        return [self._policies_cache[policy_id] for policy_id in self._in_cache_order(policy_ids)]
+
+    def get_candidate_policies(self, agent_id: str,
+                               action_type: str) -> Tuple[Tuple[str, Mapping[str, Any]], ...]:
+        """Get policies whose agent and action-type scopes may cover an action.
+
+        This is an index pre-filter: callers still evaluate the full scope and
+        conditions, but never see policies scoped to other agents or action types.
+        Policies change far less often than actions arrive, so each
+        (agent_id, action_type) result is memoised until the next policy change.
+        """
+        plan_key = (agent_id, action_type)
+        plan = self._candidate_plans.get(plan_key)
+        if plan is not None:
+            return plan
+
+        empty: Set[str] = set()
+        by_agent = self._policies_by_agent
+        by_action_type = self._policies_by_action_type
+        policy_ids = ((by_agent.get(agent_id, empty) | by_agent.get('*', empty)) &
+                      (by_action_type.get(action_type, empty) | by_action_type.get('*', empty)))
+        plan = tuple((policy_id, self._policies_cache[policy_id]) for policy_id in self._in_cache_order(policy_ids))
+
+        if len(self._candidate_plans) >= _MAX_CANDIDATE_PLANS:
+            self._candidate_plans.clear()
+        self._candidate_plans[plan_key] = plan
+        return plan
+
+    def is_policy_active(self, policy_id: str, now: Optional[datetime] = None) -> bool:
+        """Check if a policy is active at now (defaults to the current time)."""
+        if now is None:
+            now = datetime.now()
+        cached = self._active_cache.get(policy_id)
+        if cached is not None and cached[1] <= now < cached[2]:
+            return cached[0]
+
+        policy_window = self._policy_windows.get(policy_id)
+        if policy_window is None:
             return False
 
-        now = datetime.now()
-        effective_date = policy.get('effective_date')
-        expiry_date = policy.get('expiry_date')
+        effective_date, expiry_date = policy_window
 
-        if effective_date and isinstance(effective_date, str):
-            effective_date = datetime.fromisoformat(effective_date.replace('Z', '+00:00'))
-        if expiry_date and isinstance(expiry_date, str):
-            expiry_date = datetime.fromisoformat(expiry_date.replace('Z', '+00:00'))
+        # Expiry is inclusive, so the policy lapses one tick after expiry_date
+        lapses_at = expiry_date + timedelta(microseconds=1) if expiry_date else datetime.max
 
         if effective_date and now < effective_date:
-            return False
-        if expiry_date and now > expiry_date:
-            return False
+            active, valid_from, changes_at = False, datetime.min, effective_date
+        elif now >= lapses_at:
+            active, valid_from, changes_at = False, lapses_at, datetime.max
+        else:
+            active, valid_from, changes_at = True, effective_date or datetime.min, lapses_at
+
+        self._active_cache[policy_id] = (active, valid_from, changes_at)
+        return active
+
+    def get_activity_window(self, now: datetime) -> Tuple[datetime, datetime]:
+        """Get the span [start, end) around now in which no policy becomes active or lapses."""
+        boundaries = self._activity_boundaries
+        if boundaries is None:
+            times = set()
+            for effective_date, expiry_date in self._policy_windows.values():
+                if effective_date:
+                    times.add(effective_date)
+                if expiry_date:
+                    # Expiry is inclusive, matching is_policy_active
+                    times.add(expiry_date + timedelta(microseconds=1))
+            boundaries = self._activity_boundaries = sorted(times)
 
-        return True
+        position = bisect_right(boundaries, now)
+        start = boundaries[position - 1] if position else datetime.min
+        end = boundaries[position] if position < len(boundaries) else datetime.max
+        return start, end
 
 # Global policy loader instance
 policy_loader = PolicyLoader()
@@ -126,6 +126,23 @@ class ComplianceReportResponse(BaseModel):
     detailed_violations: List[ViolationDetail] = Field(default_factory=list)
     recommendations: List[str] = Field(default_factory=list)
 
+# Batch Schemas
+class BatchOperation(BaseModel):
+    op: str = Field(..., description="Operation to run: register_agent, submit_action_log, "
+                                     "enforcement_decision or upload_policy")
+    payload: Dict[str, Any] = Field(default_factory=dict, description="Request body for the operation")
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., description="Operations to run, in order")
+
+class BatchOperationResult(BaseModel):
+    op: str
+    status_code: int
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchOperationResult]
+
 # Error Response Schema
 class ErrorResponse(BaseModel):
     error: bool = True
@@ -1,120 +1,171 @@
-from typing import Dict, List, Any, Optional
+import re
+import sys
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from app.policy_loader import policy_loader
 from app.schemas import ViolationDetail, ViolationSeverity, ActionType
 
+# Compiled rule check: (agent_id, action type value, lower-cased description, context, current hour) -> violated
+RuleCheck = Callable[[str, str, str, Dict[str, Any], int], bool]
+# Compiled policy scope check: (agent_id, action type value, context) -> applies
+ScopeCheck = Callable[[str, str, Dict[str, Any]], bool]
+CompiledRule = Tuple[Dict[str, Any], RuleCheck, Optional[ViolationDetail]]
+
+def _intern_key(key: Any) -> Any:
+    """Intern a string key so lookups with the same interned string match by identity."""
+    return sys.intern(key) if type(key) is str else key
+
+def _compile_scope(scope: Any) -> Any:
+    """Prepare an agent or action-type scope for membership tests (None if unscoped)."""
+    if not scope or '*' in scope:
+        return None
+    if isinstance(scope, (list, tuple)):
+        try:
+            return frozenset(map(_intern_key, scope))
+        except TypeError:
+            pass
+    return scope
+
 class ViolationChecker:
     def __init__(self):
         self.policy_loader = policy_loader
+        # policy_id -> (policy dict it was compiled from, scope check,
+        #               [(rule, rule check, prebuilt violation or None)])
+        self._compiled_policies: Dict[str, Tuple[Dict[str, Any], ScopeCheck, List[CompiledRule]]] = {}
 
     def check_action_compliance(self, agent_id: str, action_type: ActionType, 
-                              action_description: str, context: Dict[str, Any]) -> List[ViolationDetail]:
+                              action_description: str, context: Dict[str, Any],
+                              now: Optional[datetime] = None) -> List[ViolationDetail]:
         """Check if an action complies with all applicable policies."""
+        if now is None:
+            now = datetime.now()
+        current_hour = now.hour
         violations = []
+        # Agent ids are a bounded namespace; interning lets scope lookups match by identity
+        agent_id = _intern_key(agent_id)
+        action_description = action_description.lower()
+        # Compiled checks compare plain strings rather than enum members
+        action_type_value = action_type.value
 
-        # Get all active policies
-        all_policies = self.policy_loader.get_all_policies()
+        # Only policies indexed under this agent and action type can apply
+        candidate_policies = self.policy_loader.get_candidate_policies(agent_id, action_type_value)
 
-        for policy_id, policy in all_policies.items():
-            if not self.policy_loader.is_policy_active(policy_id):
+        for policy_id, policy in candidate_policies:
+            if not self.policy_loader.is_policy_active(policy_id, now):
                 continue
 
             # Check if policy applies to this agent/action
-            if self._policy_applies_to_action(policy, agent_id, action_type, context):
-                violation = self._check_policy_violation(policy, agent_id, action_type, 
-                                                       action_description, context)
+            _, policy_applies, compiled_rules = self._get_compiled_policy(policy)
+            if policy_applies(agent_id, action_type_value, context):
+                violation = self._check_policy_violation(policy, compiled_rules, agent_id,
+                                                         action_type_value, action_description, context,
+                                                         current_hour)
                 if violation:
                     violations.append(violation)
 
         return violations
 
-    def _policy_applies_to_action(self, policy: Dict[str, Any], agent_id: str, 
-                                 action_type: ActionType, context: Dict[str, Any]) -> bool:
-        """Determine if a policy applies to the given action."""
-        policy_content = policy.get('policy_content', {})
-
-        # Check agent scope
-        agent_scope = policy_content.get('agent_scope', [])
-        if agent_scope and agent_id not in agent_scope and '*' not in agent_scope:
-            return False
-
-        # Check action type scope
-        action_scope = policy_content.get('action_types', [])
-        if action_scope and action_type.value not in action_scope and '*' not in action_scope:
-            return False
-
-        # Check context conditions
-        conditions = policy_content.get('conditions', {})
-        if conditions and not self._evaluate_conditions(conditions, context):
-            return False
-
-        return True
-
-    def _check_policy_violation(self, policy: Dict[str, Any], agent_id: str, 
-                               action_type: ActionType, action_description: str, 
-                               context: Dict[str, Any]) -> Optional[ViolationDetail]:
-        """Check if an action violates a specific policy."""
-        policy_content = policy.get('policy_content', {})
-        rules = policy_content.get('rules', [])
-
-        for rule in rules:
-            if self._rule_violated(rule, agent_id, action_type, action_description, context):
-                return ViolationDetail(
-                    policy_id=policy['policy_id'],
-                    violation_type=rule.get('violation_type', 'policy_violation'),
-                    severity=ViolationSeverity(rule.get('severity', 'medium')),
-                    description=rule.get('description', f"Violation of policy {policy['policy_id']}")
-                )
+    def _check_policy_violation(self, policy: Dict[str, Any], compiled_rules: List[CompiledRule],
+                               agent_id: str, action_type: str, action_description: str,
+                               context: Dict[str, Any], current_hour: int) -> Optional[ViolationDetail]:
+        """Check if an action violates a specific policy.
+
+        action_description must already be lower-cased.
+        """
+        for rule, rule_check, violation in compiled_rules:
+            if rule_check(agent_id, action_type, action_description, context, current_hour):
+                return violation if violation is not None else self._build_violation(policy, rule)
 
         return None
 
-    def _rule_violated(self, rule: Dict[str, Any], agent_id: str, action_type: ActionType, 
-                      action_description: str, context: Dict[str, Any]) -> bool:
-        """Check if a specific rule is violated."""
+    def _build_violation(self, policy: Dict[str, Any], rule: Dict[str, Any]) -> ViolationDetail:
+        """Build the violation reported when a policy rule is broken."""
+        return ViolationDetail(
+            policy_id=policy['policy_id'],
+            violation_type=rule.get('violation_type', 'policy_violation'),
+            severity=ViolationSeverity(rule.get('severity', 'medium')),
+            description=rule.get('description', f"Violation of policy {policy['policy_id']}")
+        )
+
+    def _get_compiled_policy(self, policy: Dict[str, Any]) -> Tuple[Dict[str, Any], ScopeCheck,
+                                                                     List[CompiledRule]]:
+        """Get a policy's compiled scope check and rules, recompiling when the policy is replaced."""
+        policy_id = policy['policy_id']
+        compiled = self._compiled_policies.get(policy_id)
+        if compiled is None or compiled[0] is not policy:
+            policy_content = policy.get('policy_content', {})
+            compiled_rules = []
+            for rule in policy_content.get('rules', []):
+                rule_check = self._compile_rule(rule)
+                if rule_check is None:
+                    continue
+                # A rule's violation never changes, so validate it once and share it
+                try:
+                    violation = self._build_violation(policy, rule)
+                except ValueError:
+                    violation = None  # Rebuilt (and raised) only if the rule is broken
+                compiled_rules.append((rule, rule_check, violation))
+            compiled = (policy, self._compile_policy_scope(policy_content), compiled_rules)
+            self._compiled_policies[policy_id] = compiled
+        return compiled
+
+    def _compile_policy_scope(self, policy_content: Dict[str, Any]) -> ScopeCheck:
+        """Compile a policy's agent scope, action-type scope and context conditions into one check."""
+        agent_scope = _compile_scope(policy_content.get('agent_scope', []))
+        action_scope = _compile_scope(policy_content.get('action_types', []))
+        conditions = tuple((_intern_key(key), expected_value)
+                           for key, expected_value in policy_content.get('conditions', {}).items())
+
+        def policy_applies(agent_id, action_type, context):
+            if agent_scope is not None and agent_id not in agent_scope:
+                return False
+            if action_scope is not None and action_type not in action_scope:
+                return False
+            for key, expected_value in conditions:
+                if context.get(key) != expected_value:
+                    return False
+            return True
+        return policy_applies
+
+    def _compile_rule(self, rule: Dict[str, Any]) -> Optional[RuleCheck]:
+        """Compile a rule into a check function, or None if it can never be violated."""
         rule_type = rule.get('type')
 
         if rule_type == 'forbidden_action':
             forbidden_patterns = rule.get('patterns', [])
-            return any(pattern in action_description.lower() for pattern in forbidden_patterns)
+            if not forbidden_patterns:
+                return None
+            # One regex pass finds any of the patterns as a plain substring
+            search = re.compile('|'.join(map(re.escape, forbidden_patterns))).search
+            return lambda agent_id, action_type, description, context, current_hour: (
+                search(description) is not None
+            )
 
         elif rule_type == 'time_restriction':
-            return self._check_time_restriction(rule, context)
+            allowed_hours = frozenset(rule.get('allowed_hours', []))
+            if not allowed_hours:
+                return None
+            return lambda agent_id, action_type, description, context, current_hour: (
+                current_hour not in allowed_hours
+            )
 
         elif rule_type == 'resource_limit':
-            return self._check_resource_limit(rule, context)
+            max_resources = tuple(rule.get('max_resources', {}).items())
+            if not max_resources:
+                return None
+
+            def check_resource_limit(agent_id, action_type, description, context, current_hour):
+                current_usage = context.get('resource_usage', {})
+                return any(current_usage.get(resource, 0) > limit for resource, limit in max_resources)
+            return check_resource_limit
 
         elif rule_type == 'approval_required':
-            return not context.get('approved', False)
+            return lambda agent_id, action_type, description, context, current_hour: (
+                not context.get('approved', False)
+            )
 
         # Default: no violation detected
-        return False
-
-    def _check_time_restriction(self, rule: Dict[str, Any], context: Dict[str, Any]) -> bool:
-        """Check time-based restrictions."""
-        allowed_hours = rule.get('allowed_hours', [])
-        if not allowed_hours:
-            return False
-
-        current_hour = datetime.now().hour
-        return current_hour not in allowed_hours
-
-    def _check_resource_limit(self, rule: Dict[str, Any], context: Dict[str, Any]) -> bool:
-        """Check resource usage limits."""
-        max_resources = rule.get('max_resources', {})
-        current_usage = context.get('resource_usage', {})
-
-        for resource, limit in max_resources.items():
-            if current_usage.get(resource, 0) > limit:
-                return True
-
-        return False
-
-    def _evaluate_conditions(self, conditions: Dict[str, Any], context: Dict[str, Any]) -> bool:
-        """Evaluate policy conditions against context."""
-        for key, expected_value in conditions.items():
-            if context.get(key) != expected_value:
-                return False
-        return True
+        return None
 
 # Global violation checker instance
 violation_checker = ViolationChecker()
@@ -1,4 +1,4 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 import os
 from pathlib import Path
@@ -10,6 +10,8 @@ class Settings(BaseSettings):
     debug: bool = True
     host: str = "0.0.0.0"
     port: int = 8000
+    # Registers POST /_test/reset, which clears in-process state; never enable in production
+    enable_test_endpoints: bool = False
 
     # Security settings
     secret_key: str = "your-secret-key-here"
@@ -17,21 +19,32 @@ class Settings(BaseSettings):
 
     # Database settings
     database_url: str = "sqlite:///./gaas.db"
+    # "memory" keeps agents per process; "sqlite" shares them via database_url
+    agent_registry_backend: str = "memory"
 
     # Logging settings
     log_level: str = "INFO"
     log_file: str = "gaas_backend.log"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    max_action_logs: int = 100000
+    # Relative to the directory of log_file
+    action_log_archive_file: str = "action_logs_archive.jsonl"
 
     # Policy management settings
     policy_storage_path: str = "./policies"
+    # "files" keeps one JSON file per policy; "sqlite" stores them all in database_url
+    policy_storage_backend: str = "files"
     max_policy_size_mb: int = 10
 
+    # Enforcement settings
+    decision_cache_max_entries: int = 10000
+    decision_cache_ttl_seconds: float = 60.0
+
     # Compliance settings
     compliance_report_retention_days: int = 90
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 # Create a global settings instance
 settings = Settings()
@@ -55,6 +55,9 @@ def start_server(host="0.0.0.0", port=8000, reload=True):
             host=host,
             port=port,
             reload=reload,
+            # uvloop is not available on Windows
+            loop="asyncio" if sys.platform == "win32" else "uvloop",
+            http="httptools",
             log_level="info"
         )
     except KeyboardInterrupt:
@@ -1,26 +1,58 @@
 import pytest
 import os
 import tempfile
+import uuid
+from datetime import datetime
 from pathlib import Path
 
+# Must be set before the app's settings are first loaded
+os.environ.setdefault("ENABLE_TEST_ENDPOINTS", "true")
+
+# Settings are built when the app is first imported, so the test storage and
+# log locations have to be in the environment before any test module loads
+TEST_DIR = tempfile.mkdtemp()
+os.environ["POLICY_STORAGE_PATH"] = os.path.join(TEST_DIR, "policies")
+os.environ["LOG_FILE"] = os.path.join(TEST_DIR, "test.log")
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_environment():
-    """Setup test environment before running tests."""
-    # Create temporary directory for test policies
-    test_dir = tempfile.mkdtemp()
-    os.environ["POLICY_STORAGE_PATH"] = test_dir
-    os.environ["LOG_FILE"] = os.path.join(test_dir, "test.log")
-
+    """Remove the temporary test directory once the session ends."""
     yield
 
     # Cleanup after tests
     import shutil
-    shutil.rmtree(test_dir, ignore_errors=True)
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
 
-@pytest.fixture
-def client():
-    """Create test client for FastAPI app."""
-    from fastapi.testclient import TestClient
+@pytest.fixture(scope="session")
+def anyio_backend():
+    """Run async tests (via AnyIO's pytest plugin) on asyncio."""
+    return "asyncio"
+
+@pytest.fixture(scope="session")
+async def client(anyio_backend):
+    """Create one async test client for the FastAPI app, shared by the whole session.
+
+    Requests go straight to the ASGI app in-process, without a portal thread
+    per call, so a test can keep several requests in flight at once.
+    """
+    import httpx
     from backend.app.main import app
 
-    return TestClient(app)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as test_client:
+        yield test_client
+
+@pytest.fixture
+def now():
+    """The current time, read once per test."""
+    return datetime.now()
+
+@pytest.fixture
+def agent_id():
+    """A fresh agent id, so tests never collide in the shared agent registry."""
+    return f"test_agent_{uuid.uuid4().hex[:12]}"
+
+@pytest.fixture
+def policy_id():
+    """A fresh policy id, so tests never overwrite each other's policies."""
+    return f"test_policy_{uuid.uuid4().hex[:12]}"
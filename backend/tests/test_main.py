@@ -1,151 +1,217 @@
 import pytest
+import asyncio
 import json
+import orjson
+import uuid
 from datetime import datetime, timedelta
-from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 
-from backend.app.main import app
-from backend.app.schemas import AgentStatus, ActionType, EnforcementAction, ViolationSeverity
-
-client = TestClient(app)
+from backend.app.schemas import (
+    AgentRegistrationRequest, AgentStatus, ActionType, EnforcementAction, ViolationSeverity
+)
+
+pytestmark = pytest.mark.anyio
+
+# Registration body shared by the agents registered in these tests, validated once
+_BASE_AGENT = AgentRegistrationRequest(
+    agent_id="test_agent_base",
+    name="Test Agent",
+    capabilities=["testing"],
+    agent_type="test"
+).model_dump(mode="json")
+
+# Compliance report window, computed once per process; it spans the whole test
+# session so actions logged by the tests fall inside it
+_NOW = datetime.now()
+_COMPLIANCE_START = (_NOW - timedelta(days=7)).isoformat()
+_COMPLIANCE_END = (_NOW + timedelta(days=1)).isoformat()
+
+# Fields shared by the policies uploaded in these tests
+_BASE_POLICY = {
+    "policy_name": "Test Access Policy",
+    "policy_type": "access_control",
+    "policy_content": {"rules": []},
+    "version": "1.0.0"
+}
+
+# Request headers shared by every JSON POST, built once
+_JSON_HEADERS = {"content-type": "application/json"}
+
+async def _post(client, url, payload):
+    """POST a JSON body encoded with orjson."""
+    return await client.post(url, content=orjson.dumps(payload), headers=_JSON_HEADERS)
+
+@pytest.fixture(scope="module", autouse=True)
+async def warmup(client):
+    """Reset app state, then send one request to each endpoint before the tests run.
+
+    First-request work (route dispatch, lazily compiled patterns and caches)
+    then happens here rather than inside whichever test happens to run first.
+    """
+    response = await client.post("/_test/reset")
+    assert response.status_code == 200
+
+    agent_id = f"warmup_agent_{uuid.uuid4().hex[:12]}"
+    await asyncio.gather(client.get("/"), client.get("/health"))
+    await _post(client, "/register_agent", {**_BASE_AGENT, "agent_id": agent_id})
+    await asyncio.gather(
+        _post(client, "/submit_action_log", {
+            "agent_id": agent_id,
+            "action_type": "data_access",
+            "action_description": "Warmup action",
+            "timestamp": _NOW.isoformat()
+        }),
+        _post(client, "/enforcement_decision", {"agent_id": agent_id, "proposed_action": "warmup"}),
+        client.get("/enforcement_decision", params={"agent_id": agent_id, "proposed_action": "warmup"}),
+        client.get("/compliance_report", params={"start_date": _COMPLIANCE_START, "end_date": _COMPLIANCE_END})
+    )
 
 class TestAgentRegistration:
-    def test_register_agent_success(self):
+    async def test_register_agent_success(self, client, agent_id):
         """Test successful agent registration."""
         agent_data = {
-            "agent_id": "test_agent_001",
-            "name": "Test Agent",
+            **_BASE_AGENT,
+            "agent_id": agent_id,
             "capabilities": ["data_processing", "analysis"],
             "agent_type": "analytical",
             "contact_info": "test@example.com"
         }
 
-        response = client.post("/register_agent", json=agent_data)
+        response = await _post(client, "/register_agent", agent_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = orjson.loads(response.content)
         assert data["success"] is True
-        assert data["agent_id"] == "test_agent_001"
+        assert data["agent_id"] == agent_id
         assert data["status"] == "active"
         assert "registration_timestamp" in data
 
-    def test_register_duplicate_agent(self):
+    async def test_register_duplicate_agent(self, client, agent_id):
         """Test registration of duplicate agent ID."""
-        agent_data = {
-            "agent_id": "duplicate_agent",
-            "name": "Duplicate Agent",
-            "capabilities": ["testing"],
-            "agent_type": "test"
-        }
+        agent_data = {**_BASE_AGENT, "agent_id": agent_id, "name": "Duplicate Agent"}
 
         # Register first time
-        response1 = client.post("/register_agent", json=agent_data)
+        response1 = await _post(client, "/register_agent", agent_data)
         assert response1.status_code == 200
 
         # Try to register again
-        response2 = client.post("/register_agent", json=agent_data)
+        response2 = await _post(client, "/register_agent", agent_data)
         assert response2.status_code == 400
-        assert "already exists" in response2.json()["detail"]
+        assert b"already exists" in response2.content
 
-    def test_register_agent_invalid_data(self):
+    @pytest.mark.parametrize("overrides,expected_message", [
+        ({"name": "   "}, b"cannot be empty"),
+        ({"capabilities": []}, b"at least one capability"),
+    ], ids=["blank_name", "no_capabilities"])
+    async def test_register_agent_invalid_data(self, client, agent_id, overrides, expected_message):
         """Test agent registration with invalid data."""
-        # Empty name
-        agent_data = {
-            "agent_id": "invalid_agent_001",
-            "name": "",
-            "capabilities": ["testing"],
-            "agent_type": "test"
-        }
-
-        response = client.post("/register_agent", json=agent_data)
-        assert response.status_code == 400
-        assert "cannot be empty" in response.json()["detail"]
-
-        # No capabilities
-        agent_data = {
-            "agent_id": "invalid_agent_002",
-            "name": "Invalid Agent",
-            "capabilities": [],
-            "agent_type": "test"
-        }
+        agent_data = {**_BASE_AGENT, "agent_id": agent_id, "name": "Invalid Agent", **overrides}
 
-        response = client.post("/register_agent", json=agent_data)
+        response = await _post(client, "/register_agent", agent_data)
         assert response.status_code == 400
-        assert "at least one capability" in response.json()["detail"]
+        assert expected_message in response.content
 
 class TestActionLogSubmission:
-    def setup_method(self):
-        """Setup test agent for action log tests."""
+    @pytest.fixture(scope="class")
+    async def registered_agent(self, client):
+        """Register one test agent for the action log tests and return its id."""
+        agent_id = f"test_agent_{uuid.uuid4().hex[:12]}"
         agent_data = {
-            "agent_id": "action_test_agent",
+            **_BASE_AGENT,
+            "agent_id": agent_id,
             "name": "Action Test Agent",
-            "capabilities": ["data_access"],
-            "agent_type": "test"
+            "capabilities": ["data_access"]
         }
-        client.post("/register_agent", json=agent_data)
+        await _post(client, "/register_agent", agent_data)
+        return agent_id
 
-    def test_submit_action_log_success(self):
+    async def test_submit_action_log_success(self, client, registered_agent, now):
         """Test successful action log submission."""
         action_data = {
-            "agent_id": "action_test_agent",
+            "agent_id": registered_agent,
             "action_type": "data_access",
             "action_description": "Reading user data",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "context": {"resource": "user_database"},
             "resource_accessed": "user_table"
         }
 
-        response = client.post("/submit_action_log", json=action_data)
+        response = await _post(client, "/submit_action_log", action_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = orjson.loads(response.content)
         assert data["success"] is True
         assert "log_id" in data
         assert data["message"] == "Action log submitted successfully"
 
-    def test_submit_action_log_unregistered_agent(self):
+    async def test_submit_action_log_unregistered_agent(self, client, now):
         """Test action log submission for unregistered agent."""
         action_data = {
             "agent_id": "unregistered_agent",
             "action_type": "data_access",
             "action_description": "Attempting access",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "context": {}
         }
 
-        response = client.post("/submit_action_log", json=action_data)
+        response = await _post(client, "/submit_action_log", action_data)
         assert response.status_code == 404
-        assert "not registered" in response.json()["detail"]
+        assert b"not registered" in response.content
 
 class TestEnforcementDecision:
-    def setup_method(self):
-        """Setup test agent for enforcement decision tests."""
+    @pytest.fixture(scope="class")
+    async def registered_agent(self, client):
+        """Register one test agent for the enforcement decision tests and return its id."""
+        agent_id = f"test_agent_{uuid.uuid4().hex[:12]}"
         agent_data = {
-            "agent_id": "enforcement_test_agent",
+            **_BASE_AGENT,
+            "agent_id": agent_id,
             "name": "Enforcement Test Agent",
-            "capabilities": ["system_modification"],
-            "agent_type": "test"
+            "capabilities": ["system_modification"]
         }
-        client.post("/register_agent", json=agent_data)
+        await _post(client, "/register_agent", agent_data)
+        return agent_id
 
-    def test_get_enforcement_decision_success(self):
+    async def test_get_enforcement_decision_success(self, client, registered_agent):
         """Test successful enforcement decision retrieval."""
         params = {
-            "agent_id": "enforcement_test_agent",
+            "agent_id": registered_agent,
             "proposed_action": "read user data",
             "context": json.dumps({"approved": True})
         }
 
-        response = client.get("/enforcement_decision", params=params)
+        response = await client.get("/enforcement_decision", params=params)
         assert response.status_code == 200
 
-        data = response.json()
+        data = orjson.loads(response.content)
         assert "decision" in data
         assert "reasoning" in data
         assert "timestamp" in data
-        assert data["agent_id"] == "enforcement_test_agent"
+        assert data["agent_id"] == registered_agent
+
+    async def test_post_enforcement_decision_success(self, client, registered_agent):
+        """Test enforcement decision with context sent as a JSON body."""
+        request_data = {
+            "agent_id": registered_agent,
+            "proposed_action": "read user data",
+            "context": {"approved": True}
+        }
+
+        response = await _post(client, "/enforcement_decision", request_data)
+        assert response.status_code == 200
 
-    def test_get_enforcement_decision_unregistered_agent(self):
+        data = orjson.loads(response.content)
+        assert "decision" in data
+        assert "reasoning" in data
+        assert data["agent_id"] == registered_agent
+
+        # Unregistered agents are rejected the same way as on GET
+        request_data["agent_id"] = "unregistered_enforcement_agent"
+        response = await _post(client, "/enforcement_decision", request_data)
+        assert response.status_code == 404
+        assert b"not registered" in response.content
+
+    async def test_get_enforcement_decision_unregistered_agent(self, client):
         """Test enforcement decision for unregistered agent."""
         params = {
             "agent_id": "unregistered_enforcement_agent",
@@ -153,29 +219,28 @@ class TestEnforcementDecision:
             "context": "{}"
         }
 
-        response = client.get("/enforcement_decision", params=params)
+        response = await client.get("/enforcement_decision", params=params)
         assert response.status_code == 404
-        assert "not registered" in response.json()["detail"]
+        assert b"not registered" in response.content
 
-    def test_get_enforcement_decision_invalid_context(self):
+    async def test_get_enforcement_decision_invalid_context(self, client, registered_agent):
         """Test enforcement decision with invalid JSON context."""
         params = {
-            "agent_id": "enforcement_test_agent",
+            "agent_id": registered_agent,
             "proposed_action": "test action",
             "context": "invalid json"
         }
 
-        response = client.get("/enforcement_decision", params=params)
+        response = await client.get("/enforcement_decision", params=params)
         assert response.status_code == 400
-        assert "Invalid JSON format" in response.json()["detail"]
+        assert b"Invalid JSON format" in response.content
 
 class TestPolicyUpload:
-    def test_upload_policy_success(self):
+    async def test_upload_policy_success(self, client, policy_id, now):
         """Test successful policy upload."""
         policy_data = {
-            "policy_id": "test_policy_001",
-            "policy_name": "Test Access Policy",
-            "policy_type": "access_control",
+            **_BASE_POLICY,
+            "policy_id": policy_id,
             "policy_content": {
                 "rules": [
                     {
@@ -184,194 +249,210 @@ class TestPolicyUpload:
                     }
                 ]
             },
-            "version": "1.0.0",
-            "effective_date": datetime.now().isoformat(),
-            "expiry_date": (datetime.now() + timedelta(days=365)).isoformat()
+            "effective_date": now.isoformat(),
+            "expiry_date": (now + timedelta(days=365)).isoformat()
         }
 
-        response = client.post("/upload_policy", json=policy_data)
+        response = await _post(client, "/upload_policy", policy_data)
         assert response.status_code == 200
 
-        data = response.json()
+        data = orjson.loads(response.content)
         assert data["success"] is True
-        assert data["policy_id"] == "test_policy_001"
+        assert data["policy_id"] == policy_id
         assert data["version"] == "1.0.0"
 
-    def test_upload_policy_invalid_data(self):
+    async def test_upload_policy_invalid_data(self, client, policy_id, now):
         """Test policy upload with invalid data."""
         policy_data = {
-            "policy_id": "invalid_policy",
+            **_BASE_POLICY,
+            "policy_id": policy_id,
             "policy_name": "",  # Empty name
-            "policy_type": "access_control",
             "policy_content": {},
-            "version": "1.0.0",
-            "effective_date": datetime.now().isoformat()
+            "effective_date": now.isoformat()
         }
 
-        response = client.post("/upload_policy", json=policy_data)
+        response = await _post(client, "/upload_policy", policy_data)
         assert response.status_code == 200  # Still returns 200 but with validation errors
 
-        data = response.json()
+        data = orjson.loads(response.content)
         assert data["success"] is False
         assert len(data["validation_errors"]) > 0
 
 class TestComplianceReport:
-    def setup_method(self):
-        """Setup test data for compliance report tests."""
+    @pytest.fixture(scope="class")
+    async def reporting_agent(self, client):
+        """Register one test agent with a logged action for the report tests and return its id."""
+        agent_id = f"test_agent_{uuid.uuid4().hex[:12]}"
         # Register test agent
         agent_data = {
-            "agent_id": "compliance_test_agent",
+            **_BASE_AGENT,
+            "agent_id": agent_id,
             "name": "Compliance Test Agent",
-            "capabilities": ["reporting"],
-            "agent_type": "test"
+            "capabilities": ["reporting"]
         }
-        client.post("/register_agent", json=agent_data)
+        await _post(client, "/register_agent", agent_data)
 
         # Submit some action logs
         action_data = {
-            "agent_id": "compliance_test_agent",
+            "agent_id": agent_id,
             "action_type": "data_access",
             "action_description": "Test action for compliance",
             "timestamp": datetime.now().isoformat(),
             "context": {}
         }
-        client.post("/submit_action_log", json=action_data)
+        await _post(client, "/submit_action_log", action_data)
+        return agent_id
 
-    def test_get_compliance_report_success(self):
+    async def test_get_compliance_report_success(self, client, reporting_agent):
         """Test successful compliance report generation."""
-        start_date = (datetime.now() - timedelta(days=7)).isoformat()
-        end_date = datetime.now().isoformat()
-
         params = {
-            "start_date": start_date,
-            "end_date": end_date,
+            "start_date": _COMPLIANCE_START,
+            "end_date": _COMPLIANCE_END,
             "report_type": "summary",
             "include_violations": True
         }
 
-        response = client.get("/compliance_report", params=params)
+        response = await client.get("/compliance_report", params=params)
         assert response.status_code == 200
 
-        data = response.json()
+        data = orjson.loads(response.content)
         assert "report_id" in data
         assert "metrics" in data
         assert "generated_at" in data
         assert data["period_start"] is not None
         assert data["period_end"] is not None
 
-    def test_get_compliance_report_invalid_dates(self):
+    async def test_get_compliance_report_invalid_dates(self, client):
         """Test compliance report with invalid date range."""
-        start_date = datetime.now().isoformat()
-        end_date = (datetime.now() - timedelta(days=1)).isoformat()  # End before start
-
         params = {
-            "start_date": start_date,
-            "end_date": end_date
+            "start_date": _COMPLIANCE_END,
+            "end_date": _COMPLIANCE_START  # End before start
         }
 
-        response = client.get("/compliance_report", params=params)
+        response = await client.get("/compliance_report", params=params)
         assert response.status_code == 400
-        assert "Start date must be before end date" in response.json()["detail"]
+        assert b"Start date must be before end date" in response.content
 
-    def test_get_compliance_report_invalid_date_format(self):
+    async def test_get_compliance_report_invalid_date_format(self, client):
         """Test compliance report with invalid date format."""
         params = {
             "start_date": "invalid-date",
             "end_date": "also-invalid"
         }
 
-        response = client.get("/compliance_report", params=params)
+        response = await client.get("/compliance_report", params=params)
         assert response.status_code == 400
-        assert "Invalid date format" in response.json()["detail"]
+        assert b"Invalid date format" in response.content
 
 class TestHealthAndRoot:
-    def test_root_endpoint(self):
-        """Test root endpoint."""
-        response = client.get("/")
-        assert response.status_code == 200
+    async def test_root_and_health_endpoints(self, client):
+        """Test root and health check endpoints, requested concurrently."""
+        root_response, health_response = await asyncio.gather(client.get("/"), client.get("/health"))
+        assert root_response.status_code == 200
+        assert health_response.status_code == 200
 
-        data = response.json()
+        data = orjson.loads(root_response.content)
         assert "message" in data
         assert "version" in data
         assert "endpoints" in data
-        assert len(data["endpoints"]) == 5
+        assert len(data["endpoints"]) == 6
 
-    def test_health_check(self):
-        """Test health check endpoint."""
-        response = client.get("/health")
-        assert response.status_code == 200
-
-        data = response.json()
+        data = orjson.loads(health_response.content)
         assert data["status"] == "healthy"
         assert "timestamp" in data
         assert "registered_agents" in data
         assert "active_policies" in data
 
+class TestBatch:
+    async def test_batch_reports_each_operation(self, client, agent_id, now):
+        """Test that failing batch operations report errors without stopping the batch."""
+        response = await _post(client, "/batch", {"operations": [
+            {"op": "submit_action_log", "payload": {
+                "agent_id": agent_id,
+                "action_type": "data_access",
+                "action_description": "Logged before registration",
+                "timestamp": now.isoformat()
+            }},
+            {"op": "register_agent", "payload": {"agent_id": agent_id}},
+            {"op": "register_agent", "payload": {**_BASE_AGENT, "agent_id": agent_id}},
+            {"op": "delete_agent", "payload": {"agent_id": agent_id}}
+        ]})
+        assert response.status_code == 200
+
+        results = orjson.loads(response.content)["results"]
+        assert [result["status_code"] for result in results] == [404, 422, 200, 400]
+        assert "not registered" in results[0]["body"]["detail"]
+        assert results[2]["body"]["agent_id"] == agent_id
+        assert "Unknown batch operation" in results[3]["body"]["detail"]
+
 # Integration tests
 class TestIntegrationWorkflow:
-    def test_complete_workflow(self):
+    async def test_complete_workflow(self, client, agent_id, policy_id, now):
         """Test complete workflow from agent registration to compliance report."""
         # 1. Register agent
         agent_data = {
-            "agent_id": "workflow_test_agent",
+            **_BASE_AGENT,
+            "agent_id": agent_id,
             "name": "Workflow Test Agent",
             "capabilities": ["full_workflow"],
             "agent_type": "integration_test"
         }
 
-        reg_response = client.post("/register_agent", json=agent_data)
-        assert reg_response.status_code == 200
-
-        # 2. Upload a policy
+        # 2. Upload a policy and 3. submit an action log; steps 1-3 go in one batch
         policy_data = {
-            "policy_id": "workflow_test_policy",
+            **_BASE_POLICY,
+            "policy_id": policy_id,
             "policy_name": "Workflow Test Policy",
             "policy_type": "compliance",
-            "policy_content": {"rules": []},
-            "version": "1.0.0",
-            "effective_date": datetime.now().isoformat()
+            "effective_date": now.isoformat()
         }
 
-        policy_response = client.post("/upload_policy", json=policy_data)
-        assert policy_response.status_code == 200
-
-        # 3. Submit action log
         action_data = {
-            "agent_id": "workflow_test_agent",
+            "agent_id": agent_id,
             "action_type": "data_access",
             "action_description": "Workflow test action",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "context": {}
         }
 
-        action_response = client.post("/submit_action_log", json=action_data)
-        assert action_response.status_code == 200
+        batch_response = await _post(client, "/batch", {"operations": [
+            {"op": "register_agent", "payload": agent_data},
+            {"op": "upload_policy", "payload": policy_data},
+            {"op": "submit_action_log", "payload": action_data}
+        ]})
+        assert batch_response.status_code == 200
+        batch_results = orjson.loads(batch_response.content)["results"]
+        assert [result["status_code"] for result in batch_results] == [200, 200, 200]
+        reg_result, policy_result, action_result = batch_results
 
         # 4. Get enforcement decision
         params = {
-            "agent_id": "workflow_test_agent",
+            "agent_id": agent_id,
             "proposed_action": "workflow test decision",
             "context": "{}"
         }
 
-        decision_response = client.get("/enforcement_decision", params=params)
+        decision_response = await client.get("/enforcement_decision", params=params)
         assert decision_response.status_code == 200
+        decision_json = orjson.loads(decision_response.content)
 
         # 5. Generate compliance report
         report_params = {
-            "start_date": (datetime.now() - timedelta(hours=1)).isoformat(),
+            "start_date": (now - timedelta(hours=1)).isoformat(),
+            # Actions are logged at server time, after now was taken
             "end_date": datetime.now().isoformat(),
-            "agent_id": "workflow_test_agent"
+            "agent_id": agent_id
         }
 
-        report_response = client.get("/compliance_report", params=report_params)
+        report_response = await client.get("/compliance_report", params=report_params)
         assert report_response.status_code == 200
-
-        # Verify all steps completed successfully
-        assert all([
-            reg_response.json()["success"],
-            policy_response.json()["success"],
-            action_response.json()["success"],
-            "decision" in decision_response.json(),
-            "report_id" in report_response.json()
-        ])
+        report_json = orjson.loads(report_response.content)
+
+        # Verify all steps completed successfully, from the bodies parsed above
+        assert all((
+            reg_result["body"]["success"],
+            policy_result["body"]["success"],
+            action_result["body"]["success"],
+            "decision" in decision_json,
+            "report_id" in report_json
+        ))
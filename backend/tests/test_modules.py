@@ -1,5 +1,7 @@
 import pytest
+import json
 from datetime import datetime, timedelta
+from types import MappingProxyType
 from unittest.mock import patch, MagicMock
 
 from backend.app.policy_loader import PolicyLoader
@@ -8,11 +10,18 @@ from backend.app.enforcer import Enforcer
 from backend.app.logger import GaaSLogger
 from backend.app.schemas import ActionType, ViolationSeverity, EnforcementAction
 
-class TestPolicyLoader:
-    def setup_method(self):
-        self.policy_loader = PolicyLoader()
+@pytest.fixture(scope="class")
+def policy_loader():
+    """One policy loader per test class; loading reads the whole policy directory."""
+    return PolicyLoader()
 
-    def test_save_and_load_policy(self):
+@pytest.fixture(scope="class")
+def violation_checker():
+    """One violation checker per test class; tests swap in mock loaders with monkeypatch."""
+    return ViolationChecker()
+
+class TestPolicyLoader:
+    def test_save_and_load_policy(self, policy_loader):
         """Test saving and loading a policy."""
         policy_data = {
             "policy_id": "test_policy",
@@ -24,15 +33,36 @@ class TestPolicyLoader:
         }
 
         # Save policy
-        success = self.policy_loader.save_policy(policy_data)
+        success = policy_loader.save_policy(policy_data)
         assert success is True
 
         # Load policy
-        loaded_policy = self.policy_loader.load_policy("test_policy")
+        loaded_policy = policy_loader.load_policy("test_policy")
         assert loaded_policy is not None
         assert loaded_policy["policy_id"] == "test_policy"
 
-    def test_validate_policy_structure(self):
+    def test_cached_policies_are_read_only(self, policy_loader):
+        """Test that cached policies can't be changed by callers."""
+        policy_data = {
+            "policy_id": "test_read_only_policy",
+            "policy_name": "Read Only Policy",
+            "policy_type": "access_control",
+            "policy_content": {"rules": []},
+            "version": "1.0.0"
+        }
+        assert policy_loader.save_policy(policy_data)
+
+        # Later changes to the saved dict don't reach the cache
+        policy_data["policy_type"] = "compliance"
+        loaded_policy = policy_loader.load_policy("test_read_only_policy")
+        assert loaded_policy["policy_type"] == "access_control"
+
+        with pytest.raises(TypeError):
+            loaded_policy["policy_type"] = "compliance"
+        with pytest.raises(TypeError):
+            policy_loader.get_all_policies()["test_read_only_policy"] = policy_data
+
+    def test_validate_policy_structure(self, policy_loader):
         """Test policy structure validation."""
         valid_policy = {
             "policy_id": "valid",
@@ -47,32 +77,226 @@ class TestPolicyLoader:
             # Missing required fields
         }
 
-        assert self.policy_loader._validate_policy_structure(valid_policy) is True
-        assert self.policy_loader._validate_policy_structure(invalid_policy) is False
+        assert policy_loader._validate_policy_structure(valid_policy) is True
+        assert policy_loader._validate_policy_structure(invalid_policy) is False
 
-class TestViolationChecker:
-    def setup_method(self):
-        self.violation_checker = ViolationChecker()
+    def test_is_policy_active(self, policy_loader):
+        """Test policy activity against effective and expiry dates."""
+        now = datetime.now()
+        policy_data = {
+            "policy_name": "Dated Policy",
+            "policy_type": "access_control",
+            "policy_content": {"rules": []},
+            "version": "1.0.0"
+        }
 
-    @patch('backend.app.violation_checker.policy_loader')
-    def test_check_action_compliance_no_violations(self, mock_policy_loader):
-        """Test action compliance check with no violations."""
-        mock_policy_loader.get_all_policies.return_value = {}
+        windows = {
+            "test_active_policy": (now - timedelta(days=1), now + timedelta(days=1)),
+            "test_future_policy": (now + timedelta(days=1), None),
+            "test_expired_policy": (now - timedelta(days=2), now - timedelta(days=1))
+        }
+        for policy_id, (effective_date, expiry_date) in windows.items():
+            assert policy_loader.save_policy({
+                **policy_data,
+                "policy_id": policy_id,
+                "effective_date": effective_date.isoformat(),
+                "expiry_date": expiry_date.isoformat() if expiry_date else None
+            })
+
+        assert policy_loader.is_policy_active("test_active_policy") is True
+        assert policy_loader.is_policy_active("test_future_policy") is False
+        assert policy_loader.is_policy_active("test_expired_policy") is False
+        assert policy_loader.is_policy_active("missing_policy") is False
+
+        # A cached answer is only reused inside the span it was computed for
+        assert policy_loader.is_policy_active("test_active_policy", now - timedelta(days=2)) is False
+        assert policy_loader.is_policy_active("test_expired_policy", now - timedelta(hours=36)) is True
+        assert policy_loader.is_policy_active("test_active_policy", now) is True
+
+        # Re-saving a policy replaces its cached activity state
+        assert policy_loader.save_policy({
+            **policy_data,
+            "policy_id": "test_future_policy",
+            "effective_date": (now - timedelta(days=1)).isoformat()
+        })
+        assert policy_loader.is_policy_active("test_future_policy") is True
+
+        # Dates are parsed the same way when policies are reloaded from storage
+        reloaded = PolicyLoader()
+        assert reloaded.is_policy_active("test_active_policy") is True
+        assert reloaded.is_policy_active("test_expired_policy") is False
+
+    def test_activity_window(self, policy_loader):
+        """Test the span around a time in which no policy becomes active or lapses."""
+        effective_date = datetime(2100, 1, 1)
+        expiry_date = datetime(2100, 6, 1)
+        assert policy_loader.save_policy({
+            "policy_id": "test_windowed_policy",
+            "policy_name": "Windowed Policy",
+            "policy_type": "access_control",
+            "policy_content": {"rules": []},
+            "version": "1.0.0",
+            "effective_date": effective_date.isoformat(),
+            "expiry_date": expiry_date.isoformat()
+        })
+
+        lapses_at = expiry_date + timedelta(microseconds=1)
+        assert policy_loader.get_activity_window(datetime(2100, 3, 1)) == (effective_date, lapses_at)
+        assert policy_loader.get_activity_window(effective_date) == (effective_date, lapses_at)
+        assert policy_loader.get_activity_window(datetime(2101, 1, 1)) == (lapses_at, datetime.max)
+
+    def test_save_policy_failure_is_logged(self, policy_loader, monkeypatch, tmp_path, caplog):
+        """Test that a failed policy save returns False and logs the error."""
+        blocked_path = tmp_path / "not_a_directory"
+        blocked_path.write_text("")
+        monkeypatch.setattr(policy_loader, "policy_storage_path", blocked_path)
+
+        with caplog.at_level("ERROR"):
+            assert policy_loader.save_policy({
+                "policy_id": "test_unsaved_policy",
+                "policy_name": "Unsaved Policy",
+                "policy_type": "access_control",
+                "policy_content": {"rules": []},
+                "version": "1.0.0"
+            }) is False
+
+        assert "Error saving policy test_unsaved_policy" in caplog.text
+        assert policy_loader.load_policy("test_unsaved_policy") is None
+
+    def test_policy_with_invalid_dates_is_skipped(self, monkeypatch, tmp_path, caplog):
+        """Test that a stored policy with a malformed date doesn't stop the others loading."""
+        from backend.app.policy_loader import settings
+
+        monkeypatch.setattr(settings, "policy_storage_path", str(tmp_path))
+        policy_data = {
+            "policy_name": "Stored Policy",
+            "policy_type": "access_control",
+            "policy_content": {"rules": []},
+            "version": "1.0.0"
+        }
+        (tmp_path / "a.json").write_text(json.dumps(
+            dict(policy_data, policy_id="test_bad_date_policy", effective_date="not-a-date")
+        ))
+        (tmp_path / "b.json").write_text(json.dumps(dict(policy_data, policy_id="test_good_policy")))
 
-        violations = self.violation_checker.check_action_compliance(
-            "test_agent",
-            ActionType.DATA_ACCESS,
-            "read data",
-            {}
-        )
+        with caplog.at_level("ERROR"):
+            loader = PolicyLoader()
 
-        assert len(violations) == 0
+        assert "Skipping policy test_bad_date_policy" in caplog.text
+        assert loader.load_policy("test_bad_date_policy") is None
+        assert loader.load_policy("test_good_policy") is not None
+        assert loader.get_policy_count() == 1
 
-    @patch('backend.app.violation_checker.policy_loader')
-    def test_check_action_compliance_with_violations(self, mock_policy_loader):
-        """Test action compliance check with violations."""
-        mock_policy = {
-            "policy_001": {
+    def test_sqlite_policy_storage(self, monkeypatch, tmp_path):
+        """Test that policies saved to the SQLite backend reload in a new loader."""
+        from backend.app.policy_loader import settings
+
+        monkeypatch.setattr(settings, "policy_storage_backend", "sqlite")
+        monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path / 'gaas.db'}")
+        loader = PolicyLoader()
+
+        policy_data = {
+            "policy_id": "test_sqlite_policy",
+            "policy_name": "SQLite Policy",
+            "policy_type": "access_control",
+            "policy_content": {"rules": []},
+            "version": "1.0.0",
+            "effective_date": datetime.now() - timedelta(days=1)
+        }
+        assert loader.save_policy(policy_data)
+        assert loader.save_policy(dict(policy_data, version="1.0.1"))
+
+        reloaded = PolicyLoader()
+        assert reloaded.get_policy_count() == 1
+        assert reloaded.load_policy("test_sqlite_policy")["version"] == "1.0.1"
+        assert reloaded.is_policy_active("test_sqlite_policy") is True
+
+    def test_policy_with_datetime_values_round_trips(self, policy_loader):
+        """Test that policies saved with datetime values reload with usable dates."""
+        now = datetime.now()
+        assert policy_loader.save_policy({
+            "policy_id": "test_datetime_policy",
+            "policy_name": "Datetime Policy",
+            "policy_type": "access_control",
+            "policy_content": {"rules": []},
+            "version": "1.0.0",
+            "effective_date": now - timedelta(days=1),
+            "expiry_date": now + timedelta(days=1)
+        })
+
+        reloaded = PolicyLoader()
+        policy = reloaded.load_policy("test_datetime_policy")
+        assert datetime.fromisoformat(policy["effective_date"]) == now - timedelta(days=1)
+        assert reloaded.is_policy_active("test_datetime_policy") is True
+
+    def test_policy_files_indented_only_in_debug(self, policy_loader, monkeypatch):
+        """Test that policy files are written compactly outside debug mode."""
+        from backend.app.policy_loader import settings
+
+        def saved_text(debug):
+            monkeypatch.setattr(settings, "debug", debug)
+            assert policy_loader.save_policy({
+                "policy_id": "test_format_policy",
+                "policy_name": "Format Policy",
+                "policy_type": "access_control",
+                "policy_content": {"rules": []},
+                "version": "1.0.0",
+                "effective_date": datetime(2024, 1, 1, 9, 30)
+            })
+            return (policy_loader.policy_storage_path / "test_format_policy.json").read_text()
+
+        assert "\n" in saved_text(True)
+        compact = saved_text(False)
+        assert "\n" not in compact
+        assert json.loads(compact)["effective_date"] == "2024-01-01T09:30:00"
+
+    def test_policy_indexes(self, policy_loader):
+        """Test type and scope indexes, including replacing a saved policy."""
+        def policy(policy_id, policy_type, agent_scope, action_types):
+            return {
+                "policy_id": policy_id,
+                "policy_name": "Indexed Policy",
+                "policy_type": policy_type,
+                "policy_content": {"agent_scope": agent_scope, "action_types": action_types, "rules": []},
+                "version": "1.0.0"
+            }
+
+        assert policy_loader.save_policy(policy("test_index_a", "access_control", ["index_agent"], ["data_access"]))
+        assert policy_loader.save_policy(policy("test_index_b", "access_control", ["*"], []))
+        assert policy_loader.save_policy(policy("test_index_c", "compliance", ["other_agent"], ["*"]))
+
+        def candidate_ids(agent_id, action_type):
+            return [policy_id for policy_id, _ in policy_loader.get_candidate_policies(agent_id, action_type)
+                    if policy_id.startswith("test_index_")]
+
+        assert candidate_ids("index_agent", "data_access") == ["test_index_a", "test_index_b"]
+        assert candidate_ids("index_agent", "user_interaction") == ["test_index_b"]
+        assert candidate_ids("other_agent", "user_interaction") == ["test_index_b", "test_index_c"]
+        # Results are memoised until a policy changes
+        assert (policy_loader.get_candidate_policies("index_agent", "data_access") is
+                policy_loader.get_candidate_policies("index_agent", "data_access"))
+
+        # Re-saving a policy moves it between index buckets but keeps its position
+        assert policy_loader.save_policy(policy("test_index_a", "compliance", ["*"], ["user_interaction"]))
+        assert candidate_ids("index_agent", "data_access") == ["test_index_b"]
+        assert candidate_ids("index_agent", "user_interaction") == ["test_index_a", "test_index_b"]
+        assert [p["policy_id"] for p in policy_loader.get_policies_by_type("compliance")
+                if p["policy_id"].startswith("test_index_")] == ["test_index_a", "test_index_c"]
+
+class TestViolationChecker:
+    @pytest.fixture(autouse=True)
+    def mock_policy_loader(self, monkeypatch, violation_checker):
+        """Serve policies from a mock loader, both at module level and on the shared checker."""
+        mock = MagicMock(spec=PolicyLoader)
+        monkeypatch.setattr("backend.app.violation_checker.policy_loader", mock)
+        monkeypatch.setattr(violation_checker, "policy_loader", mock)
+        return mock
+
+    @pytest.fixture(scope="class")
+    def mock_policies(self):
+        """Policies served by mocked loaders, read-only like the loader's own cache."""
+        return MappingProxyType({
+            "policy_001": MappingProxyType({
                 "policy_id": "policy_001",
                 "policy_content": {
                     "agent_scope": ["*"],
@@ -87,13 +311,29 @@ class TestViolationChecker:
                         }
                     ]
                 }
-            }
-        }
+            })
+        })
+
+    def test_check_action_compliance_no_violations(self, violation_checker, mock_policy_loader):
+        """Test action compliance check with no violations."""
+        mock_policy_loader.get_candidate_policies.return_value = []
 
-        mock_policy_loader.get_all_policies.return_value = mock_policy
+        violations = violation_checker.check_action_compliance(
+            "test_agent",
+            ActionType.DATA_ACCESS,
+            "read data",
+            {}
+        )
+
+        assert len(violations) == 0
+
+    def test_check_action_compliance_with_violations(self, violation_checker, mock_policy_loader,
+                                                     mock_policies):
+        """Test action compliance check with violations."""
+        mock_policy_loader.get_candidate_policies.return_value = tuple(mock_policies.items())
         mock_policy_loader.is_policy_active.return_value = True
 
-        violations = self.violation_checker.check_action_compliance(
+        violations = violation_checker.check_action_compliance(
             "test_agent",
             ActionType.SYSTEM_MODIFICATION,
             "delete user data",
@@ -103,6 +343,116 @@ class TestViolationChecker:
         assert len(violations) > 0
         assert violations[0].severity == ViolationSeverity.HIGH
 
+    def test_compiled_rules(self, violation_checker, mock_policy_loader):
+        """Test rule checks and that replacing a policy recompiles its rules."""
+        policy = {
+            "policy_id": "policy_001",
+            "policy_content": {
+                "rules": [
+                    {"type": "forbidden_action", "patterns": ["delete", "rm -rf *"],
+                     "violation_type": "forbidden_action", "severity": "high"},
+                    {"type": "resource_limit", "max_resources": {"cpu": 4},
+                     "violation_type": "resource_limit", "severity": "medium"},
+                    {"type": "approval_required",
+                     "violation_type": "approval_required", "severity": "low"}
+                ]
+            }
+        }
+        mock_policy_loader.get_candidate_policies.return_value = [("policy_001", policy)]
+        mock_policy_loader.is_policy_active.return_value = True
+
+        def violation_types(action_description, context):
+            return [v.violation_type for v in violation_checker.check_action_compliance(
+                "test_agent", ActionType.SYSTEM_MODIFICATION, action_description, context
+            )]
+
+        # Only the first violated rule of a policy is reported
+        assert violation_types("DELETE records", {}) == ["forbidden_action"]
+        # Patterns are literal substrings, not regular expressions
+        assert violation_types("run rm -rf * now", {"approved": True}) == ["forbidden_action"]
+        assert violation_types("run rm -rf now", {"approved": True}) == []
+        assert violation_types("update records", {"resource_usage": {"cpu": 8}}) == ["resource_limit"]
+        assert violation_types("update records", {"resource_usage": {"cpu": 2}}) == ["approval_required"]
+        assert violation_types("update records", {"approved": True}) == []
+
+        # A re-saved policy is a new dict and gets its rules compiled again
+        mock_policy_loader.get_candidate_policies.return_value = [("policy_001", {
+            "policy_id": "policy_001",
+            "policy_content": {"rules": [{"type": "forbidden_action", "patterns": ["update"]}]}
+        })]
+        assert violation_types("update records", {"approved": True}) == ["policy_violation"]
+
+    def test_violation_details_built_once_per_rule(self, violation_checker, mock_policy_loader):
+        """Test that a rule's violation is reused and malformed rules only fail when broken."""
+        policy = {
+            "policy_id": "policy_003",
+            "policy_content": {
+                "rules": [
+                    {"type": "forbidden_action", "patterns": ["drop"], "severity": "extreme"},
+                    {"type": "forbidden_action", "patterns": ["delete"], "severity": "high"}
+                ]
+            }
+        }
+        mock_policy_loader.get_candidate_policies.return_value = [("policy_003", policy)]
+        mock_policy_loader.is_policy_active.return_value = True
+
+        def check(action_description):
+            return violation_checker.check_action_compliance(
+                "test_agent", ActionType.SYSTEM_MODIFICATION, action_description, {}
+            )
+
+        first, second = check("delete data"), check("delete data")
+        assert first[0] is second[0]
+        assert first[0].severity == ViolationSeverity.HIGH
+
+        # The invalid severity is only reported once its rule is actually violated
+        with pytest.raises(ValueError):
+            check("drop table")
+
+    def test_policy_scope_and_conditions(self, violation_checker, mock_policy_loader):
+        """Test that agent scope, action-type scope and conditions limit where a policy applies."""
+        policy = {
+            "policy_id": "policy_002",
+            "policy_content": {
+                "agent_scope": ["agent_a"],
+                "action_types": ["system_modification"],
+                "conditions": {"environment": "production"},
+                "rules": [{"type": "approval_required", "violation_type": "approval_required"}]
+            }
+        }
+        mock_policy_loader.get_candidate_policies.return_value = [("policy_002", policy)]
+        mock_policy_loader.is_policy_active.return_value = True
+
+        def violation_count(agent_id, action_type, context):
+            return len(violation_checker.check_action_compliance(agent_id, action_type, "update", context))
+
+        production = {"environment": "production"}
+        assert violation_count("agent_a", ActionType.SYSTEM_MODIFICATION, production) == 1
+        assert violation_count("agent_b", ActionType.SYSTEM_MODIFICATION, production) == 0
+        assert violation_count("agent_a", ActionType.DATA_ACCESS, production) == 0
+        assert violation_count("agent_a", ActionType.SYSTEM_MODIFICATION, {"environment": "staging"}) == 0
+
+    def test_time_restriction_uses_supplied_time(self, violation_checker, mock_policy_loader):
+        """Test that time restrictions and policy activity are checked at the supplied time."""
+        policy = {
+            "policy_id": "policy_004",
+            "policy_content": {
+                "rules": [{"type": "time_restriction", "allowed_hours": [9, 10, 11],
+                           "violation_type": "time_restriction"}]
+            }
+        }
+        mock_policy_loader.get_candidate_policies.return_value = [("policy_004", policy)]
+        mock_policy_loader.is_policy_active.return_value = True
+
+        def violation_count(now):
+            return len(violation_checker.check_action_compliance(
+                "test_agent", ActionType.DATA_ACCESS, "read data", {}, now=now
+            ))
+
+        assert violation_count(datetime(2024, 1, 1, 10, 30)) == 0
+        assert violation_count(datetime(2024, 1, 1, 22, 0)) == 1
+        mock_policy_loader.is_policy_active.assert_called_with("policy_004", datetime(2024, 1, 1, 22, 0))
+
 class TestEnforcer:
     def setup_method(self):
         self.enforcer = Enforcer()
@@ -146,18 +496,183 @@ class TestEnforcer:
         assert decision.decision == EnforcementAction.BLOCK
         assert len(decision.violations) == 1
 
+    def test_violation_results_cached_per_policy_epoch(self):
+        """Test that repeated decisions reuse violation checks until policies change."""
+        checker = MagicMock()
+        checker.check_action_compliance.return_value = []
+        checker.policy_loader.policy_epoch = 0
+        checker.policy_loader.get_activity_window.return_value = (datetime.min, datetime.max)
+        self.enforcer.violation_checker = checker
+
+        self.enforcer.make_enforcement_decision("test_agent", "read data", {"approved": True})
+        self.enforcer.make_enforcement_decision("test_agent", "read data", {"approved": True})
+        assert checker.check_action_compliance.call_count == 1
+
+        # A different context is a different cache entry
+        self.enforcer.make_enforcement_decision("test_agent", "read data", {})
+        assert checker.check_action_compliance.call_count == 2
+
+        # A policy change invalidates cached results
+        checker.policy_loader.policy_epoch = 1
+        self.enforcer.make_enforcement_decision("test_agent", "read data", {"approved": True})
+        assert checker.check_action_compliance.call_count == 3
+
+        # History is still recorded for every decision
+        assert len(self.enforcer.get_agent_enforcement_history("test_agent")) == 4
+
+    def test_violation_results_cached_per_hour_and_activity_window(self):
+        """Test that cached violations are not reused across hours or policy activity changes."""
+        checker = MagicMock()
+        checker.check_action_compliance.return_value = []
+        checker.policy_loader.policy_epoch = 0
+        start = datetime(2024, 1, 1, 12, 0, 0)
+        # A policy takes effect at 12:30
+        checker.policy_loader.get_activity_window.return_value = (datetime.min, start + timedelta(minutes=30))
+        self.enforcer.violation_checker = checker
+
+        self.enforcer.make_enforcement_decision("test_agent", "read data", {}, now=start)
+        self.enforcer.make_enforcement_decision("test_agent", "read data", {}, now=start + timedelta(minutes=10))
+        assert checker.check_action_compliance.call_count == 1
+
+        # Past the next activity boundary, but within the same hour
+        self.enforcer.make_enforcement_decision("test_agent", "read data", {}, now=start + timedelta(minutes=40))
+        assert checker.check_action_compliance.call_count == 2
+
+        # A different hour, which time restriction rules depend on
+        checker.policy_loader.get_activity_window.return_value = (datetime.min, datetime.max)
+        self.enforcer.make_enforcement_decision("test_agent", "read data", {}, now=start + timedelta(hours=1))
+        assert checker.check_action_compliance.call_count == 3
+
+    def test_repeated_decisions_escalate_to_block(self):
+        """Test that an agent with 3+ recent decisions is blocked on medium violations."""
+        # Use the schema class the enforcer module itself validates against
+        from backend.app.enforcer import ViolationDetail
+
+        checker = MagicMock()
+        checker.check_action_compliance.return_value = [
+            ViolationDetail(
+                policy_id="test_policy",
+                violation_type="medium_risk_action",
+                severity=ViolationSeverity.MEDIUM,
+                description="Medium risk action detected"
+            )
+        ]
+        self.enforcer.violation_checker = checker
+
+        decisions = [
+            self.enforcer.make_enforcement_decision("test_agent", f"action {i}", {}).decision
+            for i in range(4)
+        ]
+
+        assert decisions == [EnforcementAction.WARN] * 3 + [EnforcementAction.BLOCK]
+
+    def test_decision_uses_supplied_time(self):
+        """Test that one timestamp is used for the response, history and escalation window."""
+        from backend.app.enforcer import ViolationDetail
+
+        checker = MagicMock()
+        checker.check_action_compliance.return_value = [
+            ViolationDetail(
+                policy_id="test_policy",
+                violation_type="medium_risk_action",
+                severity=ViolationSeverity.MEDIUM,
+                description="Medium risk action detected"
+            )
+        ]
+        self.enforcer.violation_checker = checker
+
+        start = datetime(2024, 1, 1, 12, 0, 0)
+        for i in range(3):
+            decision = self.enforcer.make_enforcement_decision("test_agent", f"action {i}", {}, now=start)
+            assert decision.timestamp == start
+        assert all(record["timestamp"] == start
+                   for record in self.enforcer.get_agent_enforcement_history("test_agent"))
+
+        # Earlier decisions fall outside the escalation window
+        later = start + timedelta(days=30)
+        decision = self.enforcer.make_enforcement_decision("test_agent", "action 3", {}, now=later)
+        assert decision.decision == EnforcementAction.WARN
+
+    def test_reasoning_and_constraints(self):
+        """Test generated reasoning and constraints for a blocking decision."""
+        from backend.app.enforcer import ViolationDetail
+
+        violations = [
+            ViolationDetail(policy_id="p", violation_type="forbidden_action",
+                            severity=ViolationSeverity.HIGH, description="d"),
+            ViolationDetail(policy_id="p", violation_type="time_restriction",
+                            severity=ViolationSeverity.LOW, description="d")
+        ]
+
+        reasoning = self.enforcer._generate_reasoning(EnforcementAction.BLOCK, violations)
+        assert reasoning == ("Detected violations: high forbidden_action, low time_restriction. "
+                             "Action blocked due to policy violations.")
+
+        constraints = self.enforcer._generate_constraints(EnforcementAction.BLOCK, violations, {})
+        assert constraints == {
+            'action_blocked': True,
+            'retry_allowed': False,
+            'escalation_required': True,
+            'supervisor_notification': True
+        }
+
+        # Shared templates are not modified by violation-specific constraints
+        constraints = self.enforcer._generate_constraints(EnforcementAction.BLOCK, violations[1:], {})
+        assert 'supervisor_notification' not in constraints
+
+    def test_enforcement_history_bounded_per_agent(self):
+        """Test that only the most recent decisions are kept per agent."""
+        checker = MagicMock()
+        checker.check_action_compliance.return_value = []
+        self.enforcer.violation_checker = checker
+
+        for i in range(105):
+            self.enforcer.make_enforcement_decision("test_agent", f"action {i}", {})
+
+        history = self.enforcer.get_agent_enforcement_history("test_agent")
+        assert isinstance(history, list)
+        assert len(history) == 100
+        assert history[0]["proposed_action"] == "action 5"
+        assert self.enforcer.get_agent_enforcement_history("unknown_agent") == []
+        stats = self.enforcer.get_enforcement_statistics()
+        assert stats["agents_with_violations"] == 1
+        # Statistics cover only the retained history
+        assert stats["total_decisions"] == 100
+        assert stats["decisions_by_type"] == {"allow": 100}
+
+    def test_classify_action_type(self):
+        """Test keyword-based action classification and its priority order."""
+        assert self.enforcer._classify_action_type("Query database") == ActionType.DATA_ACCESS
+        assert self.enforcer._classify_action_type("Update settings") == ActionType.SYSTEM_MODIFICATION
+        assert self.enforcer._classify_action_type("Send message") == ActionType.USER_INTERACTION
+        assert self.enforcer._classify_action_type("Call external API") == ActionType.EXTERNAL_API_CALL
+        # Data access keywords win even when other keywords appear first
+        assert self.enforcer._classify_action_type("Update and read user data") == ActionType.DATA_ACCESS
+        # Overlapping keywords are still detected
+        assert self.enforcer._classify_action_type("messageget") == ActionType.DATA_ACCESS
+        # Keywords match inside inflected words, not just as whole tokens
+        assert self.enforcer._classify_action_type("Overwrites config files") == ActionType.SYSTEM_MODIFICATION
+        assert self.enforcer._classify_action_type("Restart service") == ActionType.DATA_ACCESS
+
 class TestGaaSLogger:
     def setup_method(self):
         self.logger = GaaSLogger()
 
     def test_generate_log_id(self):
-        """Test log ID generation."""
-        log_id1 = self.logger.generate_log_id()
-        log_id2 = self.logger.generate_log_id()
+        """Test log ID generation over a batch of back-to-back calls."""
+        log_ids = [self.logger.generate_log_id() for _ in range(1000)]
 
-        assert log_id1 != log_id2
-        assert log_id1.startswith("LOG_")
-        assert log_id2.startswith("LOG_")
+        assert len(set(log_ids)) == len(log_ids)
+        assert all(log_id.startswith("LOG_") for log_id in log_ids)
+
+    def test_generate_log_id_unique_across_threads(self):
+        """Test that concurrent log ID generation never repeats an ID."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            log_ids = list(executor.map(lambda _: self.logger.generate_log_id(), range(2000)))
+
+        assert len(set(log_ids)) == len(log_ids)
 
     def test_log_agent_registration(self):
         """Test agent registration logging."""
@@ -169,6 +684,76 @@ class TestGaaSLogger:
             "Success"
         )
 
+    def test_registration_payload_built_lazily(self):
+        """Test that a registration payload callable is only invoked at debug level."""
+        import logging
+
+        payload_factory = MagicMock(return_value={"name": "Test Agent"})
+        backend_logger = self.logger.logger
+        original_level = backend_logger.level
+        try:
+            backend_logger.setLevel(logging.INFO)
+            self.logger.log_agent_registration("test_agent", payload_factory, False, "Failed")
+            payload_factory.assert_not_called()
+
+            backend_logger.setLevel(logging.DEBUG)
+            self.logger.log_agent_registration("test_agent", payload_factory, False, "Failed")
+            payload_factory.assert_called_once()
+        finally:
+            backend_logger.setLevel(original_level)
+
+    def test_get_action_logs_for_period(self):
+        """Test time-range and agent filtering of action logs."""
+        before = datetime.now()
+        self.logger.log_action_submission("agent_a", {}, self.logger.generate_log_id(), [])
+        self.logger.log_action_submission("agent_b", {}, self.logger.generate_log_id(), [])
+        after = datetime.now()
+
+        assert len(self.logger.get_action_logs_for_period(before, after)) == 2
+        agent_logs = self.logger.get_action_logs_for_period(before, after, "agent_a")
+        assert [log["agent_id"] for log in agent_logs] == ["agent_a"]
+        assert self.logger.get_action_logs_for_period(
+            before - timedelta(days=2), before - timedelta(days=1)
+        ) == []
+
+    def test_action_logs_bounded_and_archived(self, monkeypatch, tmp_path):
+        """Test that action logs are evicted past the size limit and archived."""
+        from backend.app.logger import settings
+
+        archive_file = tmp_path / "archive.jsonl"
+        monkeypatch.setattr(settings, "max_action_logs", 10)
+        monkeypatch.setattr(settings, "action_log_archive_file", str(archive_file))
+
+        log_ids = [self.logger.generate_log_id() for _ in range(12)]
+        for log_id in log_ids:
+            self.logger.log_action_submission("agent_a", {}, log_id, [])
+
+        assert len(self.logger.action_logs) <= 10
+        assert log_ids[-1] in self.logger.action_logs
+        assert log_ids[0] not in self.logger.action_logs
+
+        archived = [json.loads(line) for line in archive_file.read_text().splitlines()]
+        assert archived[0]["log_id"] == log_ids[0]
+        assert len(archived) + len(self.logger.action_logs) == 12
+
+        # The per-agent index drops evicted logs too
+        agent_logs = self.logger.get_action_logs_for_period(datetime.min, datetime.max, "agent_a")
+        assert [log["log_id"] for log in agent_logs] == log_ids[-len(self.logger.action_logs):]
+
+    def test_action_log_archive_next_to_log_file(self, monkeypatch, tmp_path):
+        """Test that a relative archive path is resolved in the log file's directory."""
+        from backend.app.logger import settings
+
+        monkeypatch.setattr(settings, "log_file", str(tmp_path / "gaas_backend.log"))
+        monkeypatch.setattr(settings, "action_log_archive_file", "archive.jsonl")
+
+        log_id = self.logger.generate_log_id()
+        self.logger.log_action_submission("agent_a", {}, log_id, [])
+        self.logger._archive_action_logs([self.logger.action_logs[log_id]])
+
+        archived = [json.loads(line) for line in (tmp_path / "archive.jsonl").read_text().splitlines()]
+        assert [record["log_id"] for record in archived] == [log_id]
+
     def test_get_violation_statistics(self):
         """Test violation statistics calculation."""
         start_date = datetime.now() - timedelta(days=1)
@@ -181,3 +766,63 @@ class TestGaaSLogger:
         assert "compliant_actions" in stats
         assert "compliance_rate" in stats
         assert "violation_types" in stats
+
+    def test_get_violation_statistics_counts(self):
+        """Test violation counts and compliance rate over logged actions."""
+        from backend.app.schemas import ViolationDetail
+
+        def violation(violation_type):
+            return ViolationDetail(policy_id="p", violation_type=violation_type,
+                                   severity=ViolationSeverity.LOW, description="d")
+
+        start_date = datetime.now()
+        self.logger.log_action_submission("agent_a", {}, self.logger.generate_log_id(), [])
+        self.logger.log_action_submission("agent_a", {}, self.logger.generate_log_id(),
+                                          [violation("forbidden_action"), violation("time_restriction")])
+        self.logger.log_action_submission("agent_b", {}, self.logger.generate_log_id(),
+                                          [violation("forbidden_action")])
+        end_date = datetime.now()
+
+        stats = self.logger.get_violation_statistics(start_date, end_date)
+
+        assert stats["total_actions"] == 3
+        assert stats["total_violations"] == 3
+        assert stats["compliant_actions"] == 1
+        assert stats["violation_types"] == {"forbidden_action": 2, "time_restriction": 1}
+
+class TestSQLiteAgentRegistry:
+    def test_registry_round_trip_and_sharing(self, tmp_path):
+        """Test that agent records persist and are visible to other registry instances."""
+        from backend.app.agent_registry import SQLiteAgentRegistry, AgentStatus
+
+        db_path = str(tmp_path / "agents.db")
+        registry = SQLiteAgentRegistry(db_path)
+        registered_at = datetime.now()
+        registry["agent_a"] = {
+            "agent_id": "agent_a",
+            "name": "Agent A",
+            "capabilities": ["testing"],
+            "agent_type": "test",
+            "contact_info": None,
+            "status": AgentStatus.ACTIVE,
+            "registration_timestamp": registered_at
+        }
+
+        # A second instance stands in for another server worker
+        other = SQLiteAgentRegistry(db_path)
+        assert "agent_a" in other
+        assert "agent_b" not in other
+        assert len(other) == 1
+        agent = other["agent_a"]
+        assert agent["status"] == AgentStatus.ACTIVE
+        assert agent["registration_timestamp"] == registered_at
+        assert agent["capabilities"] == ["testing"]
+
+        del other["agent_a"]
+        assert "agent_a" not in registry
+        with pytest.raises(KeyError):
+            registry["agent_a"]
+
+        registry["agent_a"] = agent
+        other.clear()
+        assert len(registry) == 0
@@ -5,8 +5,10 @@ This module defines different types of agents with varying compliance patterns.
 
 import random
 import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from itertools import accumulate, islice, product
+from typing import Deque, Dict, Any, List, Optional, Tuple
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 import logging
@@ -15,6 +17,15 @@ from client_interface import GaaSClient, ClientConfig
 
 logger = logging.getLogger(__name__)
 
+# Below this many agents, worker start-up and pickling cost more than they save
+PARALLEL_MIN_AGENTS = 32
+
+# Enforcement decisions an adaptive agent counts as blocks
+_BLOCKING_DECISIONS = frozenset(('block', 'suspend'))
+
+# Client of this worker process, opened by init_worker
+_worker_client: Optional[GaaSClient] = None
+
 @dataclass
 class AgentMetrics:
     """Metrics tracking for individual agents."""
@@ -23,11 +34,17 @@ class AgentMetrics:
     violations: int = 0
     blocked_actions: int = 0
     warnings_received: int = 0
-    response_times: List[float] = None
+    # Running response time statistics (Welford), so memory stays constant over long runs
+    rt_count: int = 0
+    rt_mean: float = 0.0
+    rt_m2: float = 0.0
     
-    def __post_init__(self):
-        if self.response_times is None:
-            self.response_times = []
+    def record_response_time(self, response_time: float):
+        """Add one response time to the running statistics."""
+        self.rt_count += 1
+        delta = response_time - self.rt_mean
+        self.rt_mean += delta / self.rt_count
+        self.rt_m2 += delta * (response_time - self.rt_mean)
     
     @property
     def compliance_rate(self) -> float:
@@ -39,13 +56,22 @@ class AgentMetrics:
     @property
     def average_response_time(self) -> float:
         """Calculate average response time."""
-        if not self.response_times:
+        return self.rt_mean
+    
+    @property
+    def response_time_stddev(self) -> float:
+        """Calculate the sample standard deviation of response times."""
+        if self.rt_count < 2:
             return 0.0
-        return sum(self.response_times) / len(self.response_times)
+        return (self.rt_m2 / (self.rt_count - 1)) ** 0.5
 
 class BaseAgent(ABC):
     """Abstract base class for all agent types."""
     
+    # Fixed attribute layout instead of a per-agent __dict__; subclasses add their own
+    __slots__ = ('agent_id', 'name', 'agent_type', 'capabilities', 'client', 'metrics',
+                 'registered', 'active')
+    
     def __init__(self, agent_id: str, name: str, agent_type: str, 
                  capabilities: List[str], client: GaaSClient):
         self.agent_id = agent_id
@@ -56,6 +82,22 @@ class BaseAgent(ABC):
         self.metrics = AgentMetrics()
         self.registered = False
         self.active = True
+    
+    def __getstate__(self):
+        """Pickle without the client; its open connections belong to this process."""
+        state = {
+            name: getattr(self, name)
+            for cls in type(self).__mro__
+            for name in getattr(cls, '__slots__', ())
+            if hasattr(self, name)
+        }
+        state['client'] = None
+        return state
+    
+    def __setstate__(self, state):
+        """Restore the slot values saved by __getstate__."""
+        for name, value in state.items():
+            setattr(self, name, value)
         
     def register(self) -> bool:
         """Register the agent with the GaaS backend."""
@@ -67,20 +109,39 @@ class BaseAgent(ABC):
                 agent_type=self.agent_type,
                 contact_info=f"agent-{self.agent_id}@simulation.local"
             )
-            
-            self.metrics.response_times.append(response_time)
-            
-            if response.get('success', False):
-                self.registered = True
-                logger.info(f"Agent {self.agent_id} registered successfully")
-                return True
-            else:
-                logger.error(f"Failed to register agent {self.agent_id}: {response}")
-                return False
-                
         except Exception as e:
             logger.error(f"Error registering agent {self.agent_id}: {str(e)}")
             return False
+        
+        return self._record_registration(response, response_time)
+    
+    async def aregister(self) -> bool:
+        """Async version of register."""
+        try:
+            response, response_time = await self.client.aregister_agent(
+                agent_id=self.agent_id,
+                name=self.name,
+                capabilities=self.capabilities,
+                agent_type=self.agent_type,
+                contact_info=f"agent-{self.agent_id}@simulation.local"
+            )
+        except Exception as e:
+            logger.error(f"Error registering agent {self.agent_id}: {str(e)}")
+            return False
+        
+        return self._record_registration(response, response_time)
+    
+    def _record_registration(self, response: Dict, response_time: float) -> bool:
+        """Update metrics and state from a registration response."""
+        self.metrics.record_response_time(response_time)
+        
+        if response.get('success', False):
+            self.registered = True
+            logger.info(f"Agent {self.agent_id} registered successfully")
+            return True
+        else:
+            logger.error(f"Failed to register agent {self.agent_id}: {response}")
+            return False
     
     def submit_action(self, action_type: str, action_description: str,
                      context: Dict[str, Any] = None, resource_accessed: str = None) -> Dict:
@@ -97,22 +158,52 @@ class BaseAgent(ABC):
                 context=context or {},
                 resource_accessed=resource_accessed
             )
-            
-            self.metrics.response_times.append(response_time)
-            self.metrics.total_actions += 1
-            
-            violations = response.get('violations_detected', [])
-            if violations:
-                self.metrics.violations += len(violations)
-                logger.debug(f"Agent {self.agent_id} action had violations: {violations}")
-            else:
-                self.metrics.compliant_actions += 1
-            
-            return response
-            
         except Exception as e:
             logger.error(f"Error submitting action for agent {self.agent_id}: {str(e)}")
             return {"success": False, "error": str(e)}
+        
+        return self._record_action_result(response, response_time)
+    
+    async def asubmit_action(self, action_type: str, action_description: str,
+                             context: Dict[str, Any] = None, resource_accessed: str = None) -> Dict:
+        """Async version of submit_action."""
+        if not self.registered or not self.active:
+            return {"success": False, "reason": "Agent not registered or inactive"}
+        
+        try:
+            # Queued and sent with other agents' logs in one batch
+            response, response_time = await self.client.enqueue_action_log(
+                agent_id=self.agent_id,
+                action_type=action_type,
+                action_description=action_description,
+                timestamp=datetime.now(),
+                context=context or {},
+                resource_accessed=resource_accessed
+            )
+        except Exception as e:
+            logger.error(f"Error submitting action for agent {self.agent_id}: {str(e)}")
+            return {"success": False, "error": str(e)}
+        
+        if 'error' in response:
+            logger.error(f"Error submitting action for agent {self.agent_id}: {response['error']}")
+            return {"success": False, "error": response['error']}
+        
+        return self._record_action_result(response, response_time)
+    
+    def _record_action_result(self, response: Dict, response_time: float) -> Dict:
+        """Update metrics from an action log response."""
+        metrics = self.metrics
+        metrics.record_response_time(response_time)
+        metrics.total_actions += 1
+        
+        violations = response.get('violations_detected')
+        if violations:
+            metrics.violations += len(violations)
+            logger.debug(f"Agent {self.agent_id} action had violations: {violations}")
+        else:
+            metrics.compliant_actions += 1
+        
+        return response
     
     def get_enforcement_decision(self, proposed_action: str, 
                                context: Dict[str, Any] = None) -> Dict:
@@ -126,20 +217,47 @@ class BaseAgent(ABC):
                 proposed_action=proposed_action,
                 context=context or {}
             )
-            
-            self.metrics.response_times.append(response_time)
-            
-            decision = response.get('decision', 'block')
-            if decision == 'block':
-                self.metrics.blocked_actions += 1
-            elif decision == 'warn':
-                self.metrics.warnings_received += 1
-            
-            return response
-            
         except Exception as e:
             logger.error(f"Error getting enforcement decision for agent {self.agent_id}: {str(e)}")
             return {"decision": "block", "error": str(e)}
+        
+        return self._record_decision(response, response_time)
+    
+    async def aget_enforcement_decision(self, proposed_action: str,
+                                        context: Dict[str, Any] = None) -> Dict:
+        """Async version of get_enforcement_decision."""
+        if not self.registered or not self.active:
+            return {"decision": "block", "reason": "Agent not registered or inactive"}
+        
+        try:
+            response, response_time = await self.client.aget_enforcement_decision(
+                agent_id=self.agent_id,
+                proposed_action=proposed_action,
+                context=context or {}
+            )
+        except Exception as e:
+            logger.error(f"Error getting enforcement decision for agent {self.agent_id}: {str(e)}")
+            return {"decision": "block", "error": str(e)}
+        
+        return self._record_decision(response, response_time)
+    
+    def _record_decision(self, response: Dict, response_time: Optional[float]) -> Dict:
+        """Update metrics from an enforcement decision response.
+
+        response_time is None for a decision served from the client's cache,
+        which leaves the response time statistics untouched.
+        """
+        metrics = self.metrics
+        if response_time is not None:
+            metrics.record_response_time(response_time)
+        
+        decision = response.get('decision', 'block')
+        if decision == 'block':
+            metrics.blocked_actions += 1
+        elif decision == 'warn':
+            metrics.warnings_received += 1
+        
+        return response
     
     @abstractmethod
     def generate_action(self) -> Dict[str, Any]:
@@ -186,10 +304,52 @@ class BaseAgent(ABC):
             result["action_result"] = action_result
         
         return result
+    
+    async def asimulate_step(self) -> Dict[str, Any]:
+        """Async version of simulate_step; awaits the backend instead of blocking on it."""
+        if not self.active:
+            return {"status": "inactive"}
+        
+        action_data = self.generate_action()
+        
+        enforcement_decision = await self.aget_enforcement_decision(
+            proposed_action=action_data['description'],
+            context=action_data.get('context', {})
+        )
+        
+        should_execute = self.decide_action_execution(enforcement_decision)
+        
+        result = {
+            "agent_id": self.agent_id,
+            "action_generated": action_data,
+            "enforcement_decision": enforcement_decision,
+            "action_executed": should_execute
+        }
+        
+        if should_execute:
+            action_result = await self.asubmit_action(
+                action_type=action_data['type'],
+                action_description=action_data['description'],
+                context=action_data.get('context', {}),
+                resource_accessed=action_data.get('resource')
+            )
+            result["action_result"] = action_result
+        
+        return result
 
 class CompliantAgent(BaseAgent):
     """Agent that always follows governance policies and enforcement decisions."""
     
+    __slots__ = ('compliant_actions',)
+    
+    # Built once and shared by every action; treat as read-only
+    _CONTEXT = {
+        "priority": "normal",
+        "user_initiated": True,
+        "compliance_checked": True
+    }
+    _RESOURCES = tuple(f"public_resource_{i}" for i in range(1, 11))
+    
     def __init__(self, agent_id: str, name: str, client: GaaSClient):
         super().__init__(
             agent_id=agent_id,
@@ -212,12 +372,8 @@ class CompliantAgent(BaseAgent):
         return {
             "type": "data_access",
             "description": action_desc,
-            "context": {
-                "priority": "normal",
-                "user_initiated": True,
-                "compliance_checked": True
-            },
-            "resource": f"public_resource_{random.randint(1, 10)}"
+            "context": self._CONTEXT,
+            "resource": random.choice(self._RESOURCES)
         }
     
     def decide_action_execution(self, enforcement_decision: Dict) -> bool:
@@ -228,6 +384,17 @@ class CompliantAgent(BaseAgent):
 class NonCompliantAgent(BaseAgent):
     """Agent that frequently violates policies and ignores enforcement decisions."""
     
+    __slots__ = ('risky_actions',)
+    
+    # Built once and shared by every action; treat as read-only
+    _CONTEXT = {
+        "priority": "high",
+        "user_initiated": False,
+        "compliance_checked": False,
+        "risk_level": "high"
+    }
+    _RESOURCES = tuple(f"sensitive_resource_{i}" for i in range(1, 6))
+    
     def __init__(self, agent_id: str, name: str, client: GaaSClient):
         super().__init__(
             agent_id=agent_id,
@@ -252,13 +419,8 @@ class NonCompliantAgent(BaseAgent):
         return {
             "type": action_type,
             "description": action_desc,
-            "context": {
-                "priority": "high",
-                "user_initiated": False,
-                "compliance_checked": False,
-                "risk_level": "high"
-            },
-            "resource": f"sensitive_resource_{random.randint(1, 5)}"
+            "context": self._CONTEXT,
+            "resource": random.choice(self._RESOURCES)
         }
     
     def decide_action_execution(self, enforcement_decision: Dict) -> bool:
@@ -272,6 +434,22 @@ class NonCompliantAgent(BaseAgent):
 class MixedBehaviorAgent(BaseAgent):
     """Agent with mixed compliance behavior - sometimes compliant, sometimes not."""
     
+    __slots__ = ('compliance_probability', 'compliant_actions', 'questionable_actions')
+    
+    _PRIORITIES = ("low", "normal", "high")
+    _USER_INITIATED = (True, False)
+    # Every context this agent can send, built once and shared; treat as read-only
+    _CONTEXTS = {
+        (priority, user_initiated, risk_level): {
+            "priority": priority,
+            "user_initiated": user_initiated,
+            "risk_level": risk_level
+        }
+        for priority, user_initiated, risk_level in product(_PRIORITIES, _USER_INITIATED, ("low", "medium"))
+    }
+    _STANDARD_RESOURCES = tuple(f"standard_resource_{i}" for i in range(1, 21))
+    _RESTRICTED_RESOURCES = tuple(f"restricted_resource_{i}" for i in range(1, 11))
+    
     def __init__(self, agent_id: str, name: str, client: GaaSClient):
         super().__init__(
             agent_id=agent_id,
@@ -303,22 +481,20 @@ class MixedBehaviorAgent(BaseAgent):
             action_desc = random.choice(self.compliant_actions)
             action_type = "user_interaction"
             risk_level = "low"
-            resource = f"standard_resource_{random.randint(1, 20)}"
+            resource = random.choice(self._STANDARD_RESOURCES)
         else:
             # Generate questionable action
             action_desc = random.choice(self.questionable_actions)
             action_type = random.choice(["data_access", "system_modification"])
             risk_level = "medium"
-            resource = f"restricted_resource_{random.randint(1, 10)}"
+            resource = random.choice(self._RESTRICTED_RESOURCES)
         
+        priority = random.choice(self._PRIORITIES)
+        user_initiated = random.choice(self._USER_INITIATED)
         return {
             "type": action_type,
             "description": action_desc,
-            "context": {
-                "priority": random.choice(["low", "normal", "high"]),
-                "user_initiated": random.choice([True, False]),
-                "risk_level": risk_level
-            },
+            "context": self._CONTEXTS[(priority, user_initiated, risk_level)],
             "resource": resource
         }
     
@@ -338,6 +514,11 @@ class MixedBehaviorAgent(BaseAgent):
 class AdaptiveLearningAgent(BaseAgent):
     """Agent that learns from enforcement decisions and adapts behavior over time."""
     
+    __slots__ = ('learning_rate', 'action_success_rates', 'recent_decisions',
+                 '_action_types', '_cum_weights')
+    
+    _RESOURCES = tuple(f"adaptive_resource_{i}" for i in range(1, 16))
+    
     def __init__(self, agent_id: str, name: str, client: GaaSClient):
         super().__init__(
             agent_id=agent_id,
@@ -348,29 +529,34 @@ class AdaptiveLearningAgent(BaseAgent):
         )
         self.learning_rate = 0.1
         self.action_success_rates = {}  # Track success rates for different actions
-        self.recent_decisions = []  # Track recent enforcement decisions
+        # Track the 20 most recent enforcement decisions; the deque drops older ones
+        self.recent_decisions: Deque[str] = deque(maxlen=20)
+        # Sampling table for generate_action, rebuilt only after a success rate changes
+        self._action_types: List[str] = []
+        self._cum_weights: Optional[List[float]] = None
         
     def update_learning(self, action_type: str, decision: str):
         """Update learning based on enforcement decision."""
-        if action_type not in self.action_success_rates:
-            self.action_success_rates[action_type] = 0.5  # Start neutral
+        rate = self.action_success_rates.get(action_type, 0.5)  # Start neutral
         
         if decision == 'allow':
-            self.action_success_rates[action_type] += self.learning_rate * (1 - self.action_success_rates[action_type])
-        elif decision in ['block', 'suspend']:
-            self.action_success_rates[action_type] -= self.learning_rate * self.action_success_rates[action_type]
+            rate += self.learning_rate * (1 - rate)
+        elif decision in _BLOCKING_DECISIONS:
+            rate -= self.learning_rate * rate
         
+        if self.action_success_rates.get(action_type) != rate:
+            self.action_success_rates[action_type] = rate
+            self._cum_weights = None
         self.recent_decisions.append(decision)
-        if len(self.recent_decisions) > 20:
-            self.recent_decisions.pop(0)
     
     def generate_action(self) -> Dict[str, Any]:
         """Generate actions based on learned success rates."""
         # Choose action type based on learned success rates
         if self.action_success_rates:
-            action_types = list(self.action_success_rates.keys())
-            weights = [self.action_success_rates[at] for at in action_types]
-            action_type = random.choices(action_types, weights=weights)[0]
+            if self._cum_weights is None:
+                self._action_types = list(self.action_success_rates)
+                self._cum_weights = list(accumulate(self.action_success_rates.values()))
+            action_type = random.choices(self._action_types, cum_weights=self._cum_weights)[0]
         else:
             action_type = random.choice(["data_access", "user_interaction", "system_modification"])
         
@@ -391,7 +577,7 @@ class AdaptiveLearningAgent(BaseAgent):
                 "learning_iteration": len(self.recent_decisions),
                 "confidence": self.action_success_rates.get(action_type, 0.5)
             },
-            "resource": f"adaptive_resource_{random.randint(1, 15)}"
+            "resource": random.choice(self._RESOURCES)
         }
     
     def decide_action_execution(self, enforcement_decision: Dict) -> bool:
@@ -407,11 +593,110 @@ class AdaptiveLearningAgent(BaseAgent):
             return True
         elif decision == 'warn':
             # Consider recent pattern of decisions
-            recent_blocks = sum(1 for d in self.recent_decisions[-5:] if d in ['block', 'suspend'])
+            recent_blocks = sum(1 for d in islice(reversed(self.recent_decisions), 5)
+                                if d in _BLOCKING_DECISIONS)
             return recent_blocks < 2  # Be more cautious if recent blocks
         else:
             return False
 
+def simulate_population_step(agents: List[BaseAgent], client: GaaSClient) -> List[Dict[str, Any]]:
+    """Execute one simulation step for several agents with two batched backend calls.
+    
+    Follows BaseAgent.simulate_step, but all enforcement decisions are fetched
+    in one request and all executed actions are logged in another.
+    """
+    agents = [agent for agent in agents if agent.registered and agent.active]
+    if not agents:
+        return []
+    
+    actions = [agent.generate_action() for agent in agents]
+    decisions, decision_times = client.get_enforcement_decisions_batch([
+        {
+            "agent_id": agent.agent_id,
+            "proposed_action": action_data['description'],
+            "context": action_data.get('context', {})
+        }
+        for agent, action_data in zip(agents, actions)
+    ])
+    
+    results = []
+    executed = []
+    for agent, action_data, decision, decision_time in zip(agents, actions, decisions, decision_times):
+        if 'error' in decision:
+            logger.error(f"Error getting enforcement decision for agent {agent.agent_id}: {decision['error']}")
+            enforcement_decision = {"decision": "block", "error": decision['error']}
+        else:
+            enforcement_decision = agent._record_decision(decision, decision_time)
+        
+        should_execute = agent.decide_action_execution(enforcement_decision)
+        result = {
+            "agent_id": agent.agent_id,
+            "action_generated": action_data,
+            "enforcement_decision": enforcement_decision,
+            "action_executed": should_execute
+        }
+        results.append(result)
+        if should_execute:
+            executed.append((agent, action_data, result))
+    
+    if executed:
+        # The actions of one step share a timestamp
+        timestamp = datetime.now()
+        responses, log_time = client.send_action_logs_batch([
+            {
+                "agent_id": agent.agent_id,
+                "action_type": action_data['type'],
+                "action_description": action_data['description'],
+                "timestamp": timestamp,
+                "context": action_data.get('context', {}),
+                "resource_accessed": action_data.get('resource')
+            }
+            for agent, action_data, _ in executed
+        ])
+        for (agent, _, result), response in zip(executed, responses):
+            if 'error' in response:
+                logger.error(f"Error submitting action for agent {agent.agent_id}: {response['error']}")
+                result["action_result"] = {"success": False, "error": response['error']}
+            else:
+                result["action_result"] = agent._record_action_result(response, log_time)
+    
+    return results
+
+def init_worker(client_config: ClientConfig):
+    """Pool initializer: give each worker process its own client and random state."""
+    global _worker_client
+    # Forked workers inherit the parent's random state; reseed so they don't all draw the same actions
+    random.seed()
+    _worker_client = GaaSClient(client_config)
+
+def _run_shard(shard_and_steps):
+    """Run batched steps for one shard of agents inside a worker process."""
+    shard, num_steps = shard_and_steps
+    for agent in shard:
+        agent.client = _worker_client
+    results = [simulate_population_step(shard, _worker_client) for _ in range(num_steps)]
+    return shard, results
+
+def run_population_parallel(agents: List[BaseAgent], pool, num_workers: int,
+                            num_steps: int = 1) -> Tuple[List[BaseAgent], List[List[Dict[str, Any]]]]:
+    """Run batched simulation steps with the agents sharded across worker processes.
+    
+    pool must be a multiprocessing.Pool started with init_worker. Agents are
+    updated inside the workers, so the returned agents (without a client)
+    replace the ones passed in. Returns (agents, step_results), where
+    step_results[i] holds the results of step i for all agents.
+    """
+    shards = [agents[i::num_workers] for i in range(num_workers) if agents[i::num_workers]]
+    
+    updated_agents = []
+    step_results = [[] for _ in range(num_steps)]
+    for shard, results in pool.map(_run_shard, [(shard, num_steps) for shard in shards]):
+        updated_agents.extend(shard)
+        for step, shard_results in enumerate(results):
+            step_results[step].extend(shard_results)
+    
+    return updated_agents, step_results
+
 def create_agent_population(client: GaaSClient, num_agents: int = 15) -> List[BaseAgent]:
     """Create a diverse population of agents for simulation."""
     agents = []
@@ -3,9 +3,15 @@ Client interface module for interacting with the GaaS FastAPI backend.
 This module provides methods to communicate with all backend endpoints.
 """
 
+import asyncio
+import aiohttp
+import orjson
+import random
 import requests
-import json
 import time
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
@@ -15,6 +21,17 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_HEADERS = {
+    'Content-Type': 'application/json',
+    'User-Agent': 'GaaS-Client/1.0.0'
+}
+
+# Longest wait between retries, before jitter
+MAX_RETRY_BACKOFF = 8.0
+
+# Gateway errors worth retrying; any other error status fails at once
+RETRY_STATUSES = frozenset((502, 503, 504))
+
 @dataclass
 class ClientConfig:
     """Configuration for the GaaS client."""
@@ -22,6 +39,14 @@ class ClientConfig:
     timeout: int = 30
     max_retries: int = 3
     retry_delay: float = 1.0
+    # Queued action logs are sent as soon as no more are ready to be queued, once
+    # flush_batch_size are waiting, or after flush_interval seconds of steady arrivals
+    flush_batch_size: int = 64
+    flush_interval: float = 0.25
+    # Identical decision requests within decision_cache_ttl seconds reuse the
+    # last answer instead of calling the backend; 0 disables the cache
+    decision_cache_ttl: float = 0.1
+    decision_cache_size: int = 4096
 
 class GaaSClient:
     """Client interface for interacting with the GaaS backend."""
@@ -30,10 +55,33 @@ class GaaSClient:
         """Initialize the GaaS client with configuration."""
         self.config = config or ClientConfig()
         self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'User-Agent': 'GaaS-Client/1.0.0'
-        })
+        self.session.headers.update(DEFAULT_HEADERS)
+        # Keep-alive pool sized for many concurrent agents; urllib3 retries
+        # connection errors and gateway errors with jittered exponential backoff
+        adapter = HTTPAdapter(
+            pool_connections=64,
+            pool_maxsize=256,
+            max_retries=Retry(
+                total=max(self.config.max_retries - 1, 0),
+                backoff_factor=self.config.retry_delay,
+                backoff_max=MAX_RETRY_BACKOFF,
+                backoff_jitter=self.config.retry_delay,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset(['GET', 'POST']),
+                raise_on_status=False
+            )
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Created on first async request, inside the event loop that will use it
+        self._asession: Optional[aiohttp.ClientSession] = None
+        # Cleared once the backend answers /batch with 404
+        self._batch_supported = True
+        # Action logs waiting to be sent by the flush task, with the future for each response
+        self._pending_logs: Optional[asyncio.Queue] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        # (agent_id, proposed_action, encoded context) -> (expires_at, decision), oldest first
+        self._decision_cache: Dict[Tuple[str, str, bytes], Tuple[float, Dict]] = OrderedDict()
         
     def _make_request(self, method: str, endpoint: str, data: Dict = None, params: Dict = None) -> Tuple[Dict, float]:
         """
@@ -43,35 +91,83 @@ class GaaSClient:
             Tuple of (response_data, response_time_seconds)
         """
         url = f"{self.config.base_url}{endpoint}"
-        start_time = time.time()
+        method = method.upper()
+        if method not in ('GET', 'POST'):
+            raise ValueError(f"Unsupported HTTP method: {method}")
+        body = orjson.dumps(data) if method == 'POST' else None
+        
+        # Retries happen inside the session's adapter, so they are included in the timing
+        start_time = time.perf_counter()
+        if method == 'GET':
+            response = self.session.get(url, params=params, timeout=self.config.timeout)
+        else:
+            # Content-Type is already set on the session
+            response = self.session.post(url, data=body, timeout=self.config.timeout)
+        response_time = time.perf_counter() - start_time
+        
+        if response.status_code != 200:
+            logger.warning(f"HTTP {response.status_code} for {method} {endpoint}: {response.text}")
+            response.raise_for_status()
+        
+        return orjson.loads(response.content), response_time
+    
+    def _get_asession(self) -> aiohttp.ClientSession:
+        """Get the async HTTP session, opening it on first use."""
+        if self._asession is None or self._asession.closed:
+            self._asession = aiohttp.ClientSession(
+                headers=DEFAULT_HEADERS,
+                connector=aiohttp.TCPConnector(limit=256, limit_per_host=128, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.config.timeout)
+            )
+        return self._asession
+    
+    async def _amake_request(self, method: str, endpoint: str, data: Dict = None,
+                             params: Dict = None) -> Tuple[Dict, float]:
+        """
+        Async version of _make_request. aiohttp has no retry policy, so
+        retries are made here.
+        
+        Returns:
+            Tuple of (response_data, response_time_seconds)
+        """
+        if method.upper() not in ('GET', 'POST'):
+            raise ValueError(f"Unsupported HTTP method: {method}")
+        
+        url = f"{self.config.base_url}{endpoint}"
+        session = self._get_asession()
+        body = orjson.dumps(data) if data is not None else None
         
         for attempt in range(self.config.max_retries):
+            # Time each attempt on its own, so failed attempts and backoff are not counted
+            start_time = time.perf_counter()
             try:
-                if method.upper() == 'GET':
-                    response = self.session.get(url, params=params, timeout=self.config.timeout)
-                elif method.upper() == 'POST':
-                    response = self.session.post(url, json=data, timeout=self.config.timeout)
-                else:
-                    raise ValueError(f"Unsupported HTTP method: {method}")
-                
-                response_time = time.time() - start_time
-                
-                if response.status_code == 200:
-                    return response.json(), response_time
-                else:
-                    logger.warning(f"HTTP {response.status_code} for {method} {endpoint}: {response.text}")
-                    if attempt == self.config.max_retries - 1:
-                        response.raise_for_status()
+                async with session.request(method.upper(), url, data=body, params=params) as response:
+                    response_time = time.perf_counter() - start_time
+                    
+                    if response.status == 200:
+                        return orjson.loads(await response.read()), response_time
+                    else:
+                        logger.warning(f"HTTP {response.status} for {method} {endpoint}: {await response.text()}")
+                        # Like the sync session, only gateway errors are retried
+                        if response.status not in RETRY_STATUSES or attempt == self.config.max_retries - 1:
+                            response.raise_for_status()
                         
-            except requests.exceptions.RequestException as e:
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 logger.warning(f"Request attempt {attempt + 1} failed: {str(e)}")
                 if attempt == self.config.max_retries - 1:
                     raise
-                time.sleep(self.config.retry_delay * (attempt + 1))
+            
+            await asyncio.sleep(self._retry_backoff(attempt))
         
         # Should not reach here
         raise Exception("Max retries exceeded")
     
+    def _retry_backoff(self, attempt: int) -> float:
+        """Seconds to wait before retrying, jittered so clients do not retry in lockstep."""
+        return min(MAX_RETRY_BACKOFF, self.config.retry_delay * (2 ** attempt)) * random.uniform(0.5, 1.5)
+    
     def register_agent(self, agent_id: str, name: str, capabilities: List[str], 
                       agent_type: str, contact_info: str = None) -> Tuple[Dict, float]:
         """
@@ -87,16 +183,29 @@ class GaaSClient:
         Returns:
             Tuple of (response_data, response_time_seconds)
         """
-        data = {
+        data = self._registration_payload(agent_id, name, capabilities, agent_type, contact_info)
+        
+        logger.info(f"Registering agent: {agent_id}")
+        return self._make_request('POST', '/register_agent', data=data)
+    
+    async def aregister_agent(self, agent_id: str, name: str, capabilities: List[str],
+                              agent_type: str, contact_info: str = None) -> Tuple[Dict, float]:
+        """Async version of register_agent."""
+        data = self._registration_payload(agent_id, name, capabilities, agent_type, contact_info)
+        
+        logger.info(f"Registering agent: {agent_id}")
+        return await self._amake_request('POST', '/register_agent', data=data)
+    
+    def _registration_payload(self, agent_id: str, name: str, capabilities: List[str],
+                              agent_type: str, contact_info: Optional[str]) -> Dict[str, Any]:
+        """Build the request body for /register_agent."""
+        return {
             "agent_id": agent_id,
             "name": name,
             "capabilities": capabilities,
             "agent_type": agent_type,
             "contact_info": contact_info
         }
-        
-        logger.info(f"Registering agent: {agent_id}")
-        return self._make_request('POST', '/register_agent', data=data)
     
     def send_action_log(self, agent_id: str, action_type: str, action_description: str,
                        timestamp: datetime, context: Dict[str, Any] = None,
@@ -115,20 +224,38 @@ class GaaSClient:
         Returns:
             Tuple of (response_data, response_time_seconds)
         """
-        data = {
+        data = self._action_log_payload(agent_id, action_type, action_description,
+                                        timestamp, context, resource_accessed)
+        
+        logger.debug(f"Submitting action log for agent: {agent_id}")
+        return self._make_request('POST', '/submit_action_log', data=data)
+    
+    async def asend_action_log(self, agent_id: str, action_type: str, action_description: str,
+                               timestamp: datetime, context: Dict[str, Any] = None,
+                               resource_accessed: str = None) -> Tuple[Dict, float]:
+        """Async version of send_action_log."""
+        data = self._action_log_payload(agent_id, action_type, action_description,
+                                        timestamp, context, resource_accessed)
+        
+        logger.debug(f"Submitting action log for agent: {agent_id}")
+        return await self._amake_request('POST', '/submit_action_log', data=data)
+    
+    def _action_log_payload(self, agent_id: str, action_type: str, action_description: str,
+                            timestamp: datetime, context: Optional[Dict[str, Any]],
+                            resource_accessed: Optional[str]) -> Dict[str, Any]:
+        """Build the request body for /submit_action_log."""
+        return {
             "agent_id": agent_id,
             "action_type": action_type,
             "action_description": action_description,
-            "timestamp": timestamp.isoformat(),
+            # Serialized by orjson in the same ISO 8601 form as isoformat()
+            "timestamp": timestamp,
             "context": context or {},
             "resource_accessed": resource_accessed
         }
-        
-        logger.debug(f"Submitting action log for agent: {agent_id}")
-        return self._make_request('POST', '/submit_action_log', data=data)
     
     def get_enforcement_decision(self, agent_id: str, proposed_action: str,
-                               context: Dict[str, Any] = None) -> Tuple[Dict, float]:
+                               context: Dict[str, Any] = None) -> Tuple[Dict, Optional[float]]:
         """
         Get an enforcement decision from the GaaS backend.
         
@@ -138,16 +265,78 @@ class GaaSClient:
             context: Context for the decision
             
         Returns:
-            Tuple of (response_data, response_time_seconds)
+            Tuple of (response_data, response_time_seconds). The response time
+            is None when the answer came from the decision cache; such answers
+            never reach the backend, so they are not added to its enforcement
+            history either.
         """
-        params = {
+        data = self._decision_payload(agent_id, proposed_action, context)
+        cache_key = self._decision_cache_key(data)
+        cached = self._cached_decision(cache_key)
+        if cached is not None:
+            return cached, None
+        
+        logger.debug(f"Getting enforcement decision for agent: {agent_id}")
+        response, response_time = self._make_request('POST', '/enforcement_decision', data=data)
+        self._cache_decision(cache_key, response)
+        return response, response_time
+    
+    async def aget_enforcement_decision(self, agent_id: str, proposed_action: str,
+                                        context: Dict[str, Any] = None) -> Tuple[Dict, Optional[float]]:
+        """Async version of get_enforcement_decision."""
+        data = self._decision_payload(agent_id, proposed_action, context)
+        cache_key = self._decision_cache_key(data)
+        cached = self._cached_decision(cache_key)
+        if cached is not None:
+            return cached, None
+        
+        logger.debug(f"Getting enforcement decision for agent: {agent_id}")
+        response, response_time = await self._amake_request('POST', '/enforcement_decision', data=data)
+        self._cache_decision(cache_key, response)
+        return response, response_time
+    
+    def _decision_payload(self, agent_id: str, proposed_action: str,
+                          context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the request body for /enforcement_decision."""
+        return {
             "agent_id": agent_id,
             "proposed_action": proposed_action,
-            "context": json.dumps(context or {})
+            "context": context or {}
         }
-        
-        logger.debug(f"Getting enforcement decision for agent: {agent_id}")
-        return self._make_request('GET', '/enforcement_decision', params=params)
+    
+    def _decision_cache_key(self, payload: Dict[str, Any]) -> Optional[Tuple[str, str, bytes]]:
+        """Key a decision request by agent, action and context, or None when caching is off."""
+        if self.config.decision_cache_ttl <= 0:
+            return None
+        return (payload['agent_id'], payload['proposed_action'],
+                orjson.dumps(payload['context'], option=orjson.OPT_SORT_KEYS))
+    
+    def _cached_decision(self, cache_key: Optional[Tuple[str, str, bytes]]) -> Optional[Dict]:
+        """Return a copy of an unexpired cached decision, if there is one."""
+        if cache_key is None:
+            return None
+        cached = self._decision_cache.get(cache_key)
+        if cached is None:
+            return None
+        expires_at, decision = cached
+        if expires_at <= time.monotonic():
+            del self._decision_cache[cache_key]
+            return None
+        self._decision_cache.move_to_end(cache_key)
+        return dict(decision)
+    
+    def _cache_decision(self, cache_key: Optional[Tuple[str, str, bytes]], decision: Dict) -> None:
+        """Remember a successful decision, evicting the least recently used entry when full."""
+        if cache_key is None or 'error' in decision:
+            return
+        self._decision_cache[cache_key] = (time.monotonic() + self.config.decision_cache_ttl, decision)
+        self._decision_cache.move_to_end(cache_key)
+        if len(self._decision_cache) > self.config.decision_cache_size:
+            self._decision_cache.popitem(last=False)
+    
+    def invalidate_decision_cache(self) -> None:
+        """Forget all cached decisions, e.g. after the backend's policies change."""
+        self._decision_cache.clear()
     
     def upload_policy(self, policy_id: str, policy_name: str, policy_type: str,
                      policy_content: Dict[str, Any], version: str,
@@ -173,11 +362,13 @@ class GaaSClient:
             "policy_type": policy_type,
             "policy_content": policy_content,
             "version": version,
-            "effective_date": effective_date.isoformat(),
-            "expiry_date": expiry_date.isoformat() if expiry_date else None
+            "effective_date": effective_date,
+            "expiry_date": expiry_date
         }
         
         logger.info(f"Uploading policy: {policy_id}")
+        # Decisions made under the old policy set may no longer hold
+        self.invalidate_decision_cache()
         return self._make_request('POST', '/upload_policy', data=data)
     
     def get_compliance_report(self, start_date: datetime, end_date: datetime,
@@ -209,6 +400,211 @@ class GaaSClient:
         logger.info(f"Getting compliance report for period: {start_date} to {end_date}")
         return self._make_request('GET', '/compliance_report', params=params)
     
+    def get_enforcement_decisions_batch(self, requests_list: List[Dict[str, Any]]
+                                        ) -> Tuple[List[Dict], List[Optional[float]]]:
+        """
+        Get enforcement decisions for several agents in one round trip.
+        
+        Args:
+            requests_list: Dicts with agent_id, proposed_action and optional context
+            
+        Returns:
+            Tuple of (decisions in input order, response times in input order).
+            A decision fetched from the backend carries the round-trip time of
+            the batch; one served from the decision cache carries None, as in
+            get_enforcement_decision. A decision that failed on the backend is
+            returned as a dict with an 'error' key.
+        """
+        payloads = [
+            self._decision_payload(item['agent_id'], item['proposed_action'], item.get('context'))
+            for item in requests_list
+        ]
+        cache_keys = [self._decision_cache_key(payload) for payload in payloads]
+        decisions = [self._cached_decision(cache_key) for cache_key in cache_keys]
+        # Only the requests without a cached answer go to the backend
+        misses = [i for i, decision in enumerate(decisions) if decision is None]
+        
+        logger.debug(f"Getting {len(misses)} enforcement decisions in one batch "
+                     f"({len(payloads) - len(misses)} cached)")
+        fetched, response_time = self._send_batch('enforcement_decision', [payloads[i] for i in misses])
+        response_times: List[Optional[float]] = [None] * len(decisions)
+        for i, decision in zip(misses, fetched):
+            self._cache_decision(cache_keys[i], decision)
+            decisions[i] = decision
+            response_times[i] = response_time
+        return decisions, response_times
+    
+    def send_action_logs_batch(self, logs: List[Dict[str, Any]]) -> Tuple[List[Dict], float]:
+        """
+        Submit several action logs in one round trip.
+        
+        Args:
+            logs: Dicts with the keyword arguments of send_action_log
+            
+        Returns:
+            Tuple of (responses in input order, response_time_seconds). A log
+            that failed on the backend is returned as a dict with an 'error' key.
+        """
+        payloads = [
+            self._action_log_payload(log['agent_id'], log['action_type'], log['action_description'],
+                                     log['timestamp'], log.get('context'), log.get('resource_accessed'))
+            for log in logs
+        ]
+        
+        logger.debug(f"Submitting {len(payloads)} action logs in one batch")
+        return self._send_batch('submit_action_log', payloads)
+    
+    def _send_batch(self, op: str, payloads: List[Dict[str, Any]]) -> Tuple[List[Dict], float]:
+        """
+        Run one backend operation for several payloads through /batch.
+        
+        Falls back to one request per payload against the operation's own
+        endpoint when the backend does not provide /batch.
+        """
+        if not payloads:
+            return [], 0.0
+        
+        if self._batch_supported:
+            try:
+                response, response_time = self._make_request('POST', '/batch',
+                                                             data=self._batch_body(op, payloads))
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+                logger.info("Backend does not provide /batch; sending requests individually")
+                self._batch_supported = False
+            else:
+                return self._batch_results(response), response_time
+        
+        results = []
+        total_time = 0.0
+        for payload in payloads:
+            try:
+                body, response_time = self._make_request('POST', f'/{op}', data=payload)
+            except requests.exceptions.RequestException as e:
+                results.append({"error": str(e)})
+                continue
+            results.append(body)
+            total_time += response_time
+        
+        return results, total_time
+    
+    async def _asend_batch(self, op: str, payloads: List[Dict[str, Any]]) -> Tuple[List[Dict], float]:
+        """Async version of _send_batch."""
+        if not payloads:
+            return [], 0.0
+        
+        if self._batch_supported:
+            try:
+                response, response_time = await self._amake_request('POST', '/batch',
+                                                                    data=self._batch_body(op, payloads))
+            except aiohttp.ClientResponseError as e:
+                if e.status != 404:
+                    raise
+                logger.info("Backend does not provide /batch; sending requests individually")
+                self._batch_supported = False
+            else:
+                return self._batch_results(response), response_time
+        
+        results = []
+        total_time = 0.0
+        for payload in payloads:
+            try:
+                body, response_time = await self._amake_request('POST', f'/{op}', data=payload)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                results.append({"error": str(e)})
+                continue
+            results.append(body)
+            total_time += response_time
+        
+        return results, total_time
+    
+    def _batch_body(self, op: str, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the /batch request body running one operation per payload."""
+        return {"operations": [{"op": op, "payload": payload} for payload in payloads]}
+    
+    def _batch_results(self, response: Dict[str, Any]) -> List[Dict]:
+        """Unpack /batch results, turning failed operations into dicts with an 'error' key."""
+        return [
+            result['body'] if result['status_code'] == 200
+            else {"error": result['body'].get('detail'), "status_code": result['status_code']}
+            for result in response['results']
+        ]
+    
+    def enqueue_action_log(self, agent_id: str, action_type: str, action_description: str,
+                           timestamp: datetime, context: Dict[str, Any] = None,
+                           resource_accessed: str = None) -> asyncio.Future:
+        """
+        Queue an action log to be sent with others in one /batch request.
+        
+        Must be called from a running event loop. Queued logs are sent by a
+        background task once the other ready coroutines have had a turn to
+        queue theirs, capped at flush_batch_size logs and flush_interval
+        seconds; call drain() before shutting down.
+        
+        Returns:
+            Future resolving to (response_data, response_time_seconds). A log that
+            failed on the backend resolves to a dict with an 'error' key.
+        """
+        loop = asyncio.get_running_loop()
+        if self._pending_logs is None:
+            self._pending_logs = asyncio.Queue()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_loop())
+        
+        future = loop.create_future()
+        payload = self._action_log_payload(agent_id, action_type, action_description,
+                                           timestamp, context, resource_accessed)
+        self._pending_logs.put_nowait((payload, future))
+        return future
+    
+    async def _flush_loop(self):
+        """Send queued action logs in batches until cancelled.
+        
+        A batch is sent as soon as the queue stays empty across one pass of the
+        event loop. Agents awaiting their log hold a concurrency slot, so
+        waiting for a full batch or the whole interval would stall every wave.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._pending_logs.get()]
+            deadline = loop.time() + self.config.flush_interval
+            while len(batch) < self.config.flush_batch_size:
+                if self._pending_logs.empty():
+                    # Let coroutines that are ready to run queue their logs first
+                    await asyncio.sleep(0)
+                    if self._pending_logs.empty() or loop.time() >= deadline:
+                        break
+                batch.append(self._pending_logs.get_nowait())
+            
+            try:
+                results, response_time = await self._asend_batch(
+                    'submit_action_log', [payload for payload, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result((result, response_time))
+            finally:
+                for _ in batch:
+                    self._pending_logs.task_done()
+    
+    async def drain(self):
+        """Wait until every queued action log has been sent, then stop the flush task."""
+        if self._pending_logs is not None:
+            await self._pending_logs.join()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+    
     def health_check(self) -> Tuple[Dict, float]:
         """
         Check the health of the GaaS backend.
@@ -220,4 +616,11 @@ class GaaSClient:
     
     def close(self):
         """Close the HTTP session."""
-        self.session.close()
\ No newline at end of file
+        self.session.close()
+    
+    async def aclose(self):
+        """Send any queued action logs, then close the async HTTP session."""
+        await self.drain()
+        if self._asession is not None:
+            await self._asession.close()
+            self._asession = None
\ No newline at end of file
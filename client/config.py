@@ -2,13 +2,36 @@
 Configuration management for the GaaS client simulation.
 """
 
+import math
 import os
-from dataclasses import dataclass
-from typing import Optional
+import sys
+from dataclasses import dataclass, field
+from typing import Optional, Tuple, TYPE_CHECKING
 
-@dataclass
+if TYPE_CHECKING:
+    from simulation import SimulationConfig
+
+# slots=True needs Python 3.10; older interpreters get a dataclass without slots
+_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# (field, check, error message) for each field validate() checks on its own
+_FIELD_CHECKS = (
+    ("simulation_duration_minutes", lambda v: v > 0, "Simulation duration must be positive"),
+    ("step_interval_seconds", lambda v: v > 0, "Step interval must be positive"),
+    ("num_agents", lambda v: v > 0, "Number of agents must be positive"),
+    ("max_concurrent_agents", lambda v: v > 0, "Max concurrent agents must be positive"),
+    ("compliant_agent_ratio", lambda v: 0 < v <= 1, "Compliant agent ratio must be between 0 and 1"),
+    ("non_compliant_agent_ratio", lambda v: 0 <= v <= 1, "Non-compliant agent ratio must be between 0 and 1"),
+    ("mixed_behavior_agent_ratio", lambda v: 0 <= v <= 1, "Mixed behavior agent ratio must be between 0 and 1"),
+    ("adaptive_agent_ratio", lambda v: 0 <= v <= 1, "Adaptive agent ratio must be between 0 and 1"),
+)
+
+@dataclass(frozen=True, **_DATACLASS_OPTIONS)
 class ClientSimulationConfig:
-    """Configuration for the client simulation system."""
+    """Configuration for the client simulation system.
+    
+    Frozen: derive changed copies with dataclasses.replace.
+    """
     
     # Backend connection settings
     backend_host: str = "localhost"
@@ -43,67 +66,78 @@ class ClientSimulationConfig:
     file_logging: bool = True
     log_file: str = "client_simulation.log"
     
-    @property
-    def backend_url(self) -> str:
-        """Get the complete backend URL."""
-        return f"{self.backend_protocol}://{self.backend_host}:{self.backend_port}"
+    # Complete backend URL, derived from the fields above
+    backend_url: str = field(init=False, repr=False, compare=False)
+    # Agent counts (compliant, non-compliant, mixed, adaptive), derived from num_agents and the ratios
+    agent_distribution: Tuple[int, int, int, int] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Frozen, so derived values can be computed once here instead of on every read
+        object.__setattr__(self, 'backend_url',
+                           f"{self.backend_protocol}://{self.backend_host}:{self.backend_port}")
+        
+        compliant_count = max(1, int(self.num_agents * self.compliant_agent_ratio))
+        non_compliant_count = max(1, int(self.num_agents * self.non_compliant_agent_ratio))
+        mixed_count = max(1, int(self.num_agents * self.mixed_behavior_agent_ratio))
+        adaptive_count = self.num_agents - compliant_count - non_compliant_count - mixed_count
+        object.__setattr__(self, 'agent_distribution',
+                           (compliant_count, non_compliant_count, mixed_count, adaptive_count))
     
     @classmethod
     def from_environment(cls) -> 'ClientSimulationConfig':
         """Create configuration from environment variables."""
+        env = os.environ
+        
+        def flag(name: str) -> bool:
+            return env.get(name, "true").lower() == "true"
+        
         return cls(
-            backend_host=os.getenv("GAAS_BACKEND_HOST", "localhost"),
-            backend_port=int(os.getenv("GAAS_BACKEND_PORT", "8000")),
-            backend_protocol=os.getenv("GAAS_BACKEND_PROTOCOL", "http"),
-            connection_timeout=int(os.getenv("GAAS_CONNECTION_TIMEOUT", "30")),
-            max_retries=int(os.getenv("GAAS_MAX_RETRIES", "3")),
-            retry_delay=float(os.getenv("GAAS_RETRY_DELAY", "1.0")),
+            backend_host=env.get("GAAS_BACKEND_HOST", "localhost"),
+            backend_port=int(env.get("GAAS_BACKEND_PORT", "8000")),
+            backend_protocol=env.get("GAAS_BACKEND_PROTOCOL", "http"),
+            connection_timeout=int(env.get("GAAS_CONNECTION_TIMEOUT", "30")),
+            max_retries=int(env.get("GAAS_MAX_RETRIES", "3")),
+            retry_delay=float(env.get("GAAS_RETRY_DELAY", "1.0")),
             
-            simulation_duration_minutes=int(os.getenv("GAAS_SIMULATION_DURATION", "30")),
-            step_interval_seconds=float(os.getenv("GAAS_STEP_INTERVAL", "2.0")),
-            num_agents=int(os.getenv("GAAS_NUM_AGENTS", "15")),
-            max_concurrent_agents=int(os.getenv("GAAS_MAX_CONCURRENT", "5")),
-            log_interval_steps=int(os.getenv("GAAS_LOG_INTERVAL", "10")),
+            simulation_duration_minutes=int(env.get("GAAS_SIMULATION_DURATION", "30")),
+            step_interval_seconds=float(env.get("GAAS_STEP_INTERVAL", "2.0")),
+            num_agents=int(env.get("GAAS_NUM_AGENTS", "15")),
+            max_concurrent_agents=int(env.get("GAAS_MAX_CONCURRENT", "5")),
+            log_interval_steps=int(env.get("GAAS_LOG_INTERVAL", "10")),
             
-            output_directory=os.getenv("GAAS_OUTPUT_DIR", "./simulation_results"),
-            save_detailed_logs=os.getenv("GAAS_SAVE_DETAILED_LOGS", "true").lower() == "true",
-            save_agent_metrics=os.getenv("GAAS_SAVE_AGENT_METRICS", "true").lower() == "true",
-            save_response_times=os.getenv("GAAS_SAVE_RESPONSE_TIMES", "true").lower() == "true",
+            output_directory=env.get("GAAS_OUTPUT_DIR", "./simulation_results"),
+            save_detailed_logs=flag("GAAS_SAVE_DETAILED_LOGS"),
+            save_agent_metrics=flag("GAAS_SAVE_AGENT_METRICS"),
+            save_response_times=flag("GAAS_SAVE_RESPONSE_TIMES"),
             
-            log_level=os.getenv("GAAS_LOG_LEVEL", "INFO"),
-            console_logging=os.getenv("GAAS_CONSOLE_LOGGING", "true").lower() == "true",
-            file_logging=os.getenv("GAAS_FILE_LOGGING", "true").lower() == "true",
-            log_file=os.getenv("GAAS_LOG_FILE", "client_simulation.log")
+            log_level=env.get("GAAS_LOG_LEVEL", "INFO"),
+            console_logging=flag("GAAS_CONSOLE_LOGGING"),
+            file_logging=flag("GAAS_FILE_LOGGING"),
+            log_file=env.get("GAAS_LOG_FILE", "client_simulation.log")
+        )
+    
+    def to_simulation_config(self) -> 'SimulationConfig':
+        """Build the SimulationConfig that GaaSSimulation runs with."""
+        # Imported here so loading the config does not pull in the HTTP client
+        from simulation import SimulationConfig
+        
+        return SimulationConfig(
+            duration_minutes=self.simulation_duration_minutes,
+            step_interval_seconds=self.step_interval_seconds,
+            max_concurrent_agents=self.max_concurrent_agents,
+            log_interval_steps=self.log_interval_steps,
+            backend_url=self.backend_url,
+            output_directory=self.output_directory
         )
     
     def validate(self) -> bool:
         """Validate configuration parameters."""
-        if self.simulation_duration_minutes <= 0:
-            raise ValueError("Simulation duration must be positive")
-        
-        if self.step_interval_seconds <= 0:
-            raise ValueError("Step interval must be positive")
-        
-        if self.num_agents <= 0:
-            raise ValueError("Number of agents must be positive")
-        
-        if self.max_concurrent_agents <= 0:
-            raise ValueError("Max concurrent agents must be positive")
-        
-        if not (0 < self.compliant_agent_ratio <= 1):
-            raise ValueError("Compliant agent ratio must be between 0 and 1")
-        
-        if not (0 <= self.non_compliant_agent_ratio <= 1):
-            raise ValueError("Non-compliant agent ratio must be between 0 and 1")
-        
-        if not (0 <= self.mixed_behavior_agent_ratio <= 1):
-            raise ValueError("Mixed behavior agent ratio must be between 0 and 1")
-        
-        if not (0 <= self.adaptive_agent_ratio <= 1):
-            raise ValueError("Adaptive agent ratio must be between 0 and 1")
+        for name, check, message in _FIELD_CHECKS:
+            if not check(getattr(self, name)):
+                raise ValueError(message)
         
-        total_ratio = (self.compliant_agent_ratio + self.non_compliant_agent_ratio + 
-                      self.mixed_behavior_agent_ratio + self.adaptive_agent_ratio)
+        total_ratio = math.fsum((self.compliant_agent_ratio, self.non_compliant_agent_ratio,
+                                 self.mixed_behavior_agent_ratio, self.adaptive_agent_ratio))
         if abs(total_ratio - 1.0) > 0.01:
             raise ValueError(f"Agent ratios must sum to 1.0, got {total_ratio}")
         
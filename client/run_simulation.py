@@ -7,22 +7,33 @@ This script provides an easy way to run the complete simulation system.
 import sys
 import os
 import logging
-import argparse
+import dataclasses
 from datetime import datetime
 from pathlib import Path
+from typing import Dict, TYPE_CHECKING
 
 # Add the client directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# The client, simulation and agent modules (and their HTTP libraries) are
+# imported where they are used, so --help and bad arguments return quickly
 from config import ClientSimulationConfig
-from client_interface import GaaSClient, ClientConfig
-from simulation import GaaSSimulation, SimulationConfig
-from agents import create_agent_population
+
+if TYPE_CHECKING:
+    import argparse
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+_FORMATTER = logging.Formatter(LOG_FORMAT)
+
+# Horizontal rules framing the console banners
+RULE = "=" * 60
+THIN_RULE = "-" * 60
+
+# File handlers by resolved path, reused if setup_logging runs again
+_file_handlers: Dict[Path, logging.FileHandler] = {}
 
 def setup_logging(config: ClientSimulationConfig):
     """Set up logging configuration."""
-    log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    
     # Configure root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, config.log_level.upper()))
@@ -33,21 +44,26 @@ def setup_logging(config: ClientSimulationConfig):
     # Console handler
     if config.console_logging:
         console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(logging.Formatter(log_format))
+        console_handler.setFormatter(_FORMATTER)
         root_logger.addHandler(console_handler)
     
     # File handler
     if config.file_logging:
-        # Ensure log directory exists
-        log_path = Path(config.log_file)
-        log_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        file_handler = logging.FileHandler(config.log_file)
-        file_handler.setFormatter(logging.Formatter(log_format))
+        log_path = Path(config.log_file).resolve()
+        file_handler = _file_handlers.get(log_path)
+        if file_handler is None:
+            # Ensure log directory exists
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            file_handler = logging.FileHandler(log_path)
+            file_handler.setFormatter(_FORMATTER)
+            _file_handlers[log_path] = file_handler
         root_logger.addHandler(file_handler)
 
 def check_backend_connectivity(config: ClientSimulationConfig) -> bool:
     """Check if the backend is accessible."""
+    from client_interface import GaaSClient, ClientConfig
+    
     client_config = ClientConfig(
         base_url=config.backend_url,
         timeout=config.connection_timeout,
@@ -75,33 +91,35 @@ def check_backend_connectivity(config: ClientSimulationConfig) -> bool:
 
 def print_simulation_info(config: ClientSimulationConfig):
     """Print simulation configuration information."""
-    print("\n" + "="*60)
-    print("GaaS MULTI-AGENT SIMULATION")
-    print("="*60)
-    print(f"Backend URL: {config.backend_url}")
-    print(f"Simulation Duration: {config.simulation_duration_minutes} minutes")
-    print(f"Step Interval: {config.step_interval_seconds} seconds")
-    print(f"Number of Agents: {config.num_agents}")
-    print(f"Max Concurrent Agents: {config.max_concurrent_agents}")
-    print(f"Output Directory: {config.output_directory}")
-    print(f"Log Level: {config.log_level}")
-    print("-"*60)
-    
-    # Calculate agent distribution
-    compliant_count = max(1, int(config.num_agents * config.compliant_agent_ratio))
-    non_compliant_count = max(1, int(config.num_agents * config.non_compliant_agent_ratio))
-    mixed_count = max(1, int(config.num_agents * config.mixed_behavior_agent_ratio))
-    adaptive_count = config.num_agents - compliant_count - non_compliant_count - mixed_count
+    compliant_count, non_compliant_count, mixed_count, adaptive_count = config.agent_distribution
     
-    print("Agent Distribution:")
-    print(f"  - Compliant: {compliant_count}")
-    print(f"  - Non-Compliant: {non_compliant_count}")
-    print(f"  - Mixed Behavior: {mixed_count}")
-    print(f"  - Adaptive Learning: {adaptive_count}")
-    print("="*60)
+    # Written in one call rather than a print() per line
+    lines = [
+        "",
+        RULE,
+        "GaaS MULTI-AGENT SIMULATION",
+        RULE,
+        f"Backend URL: {config.backend_url}",
+        f"Simulation Duration: {config.simulation_duration_minutes} minutes",
+        f"Step Interval: {config.step_interval_seconds} seconds",
+        f"Number of Agents: {config.num_agents}",
+        f"Max Concurrent Agents: {config.max_concurrent_agents}",
+        f"Output Directory: {config.output_directory}",
+        f"Log Level: {config.log_level}",
+        THIN_RULE,
+        "Agent Distribution:",
+        f"  - Compliant: {compliant_count}",
+        f"  - Non-Compliant: {non_compliant_count}",
+        f"  - Mixed Behavior: {mixed_count}",
+        f"  - Adaptive Learning: {adaptive_count}",
+        RULE,
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def run_simulation_with_config(config: ClientSimulationConfig) -> int:
     """Run the simulation with the given configuration."""
+    from simulation import GaaSSimulation
+    
     logger = logging.getLogger(__name__)
     
     try:
@@ -123,14 +141,7 @@ def run_simulation_with_config(config: ClientSimulationConfig) -> int:
             return 1
         
         # Create simulation configuration
-        sim_config = SimulationConfig(
-            duration_minutes=config.simulation_duration_minutes,
-            step_interval_seconds=config.step_interval_seconds,
-            max_concurrent_agents=config.max_concurrent_agents,
-            log_interval_steps=config.log_interval_steps,
-            backend_url=config.backend_url,
-            output_directory=config.output_directory
-        )
+        sim_config = config.to_simulation_config()
         
         # Create and run simulation
         print(f"\nStarting simulation at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -142,9 +153,9 @@ def run_simulation_with_config(config: ClientSimulationConfig) -> int:
             metrics = simulation.run_simulation()
             
             # Print final results
-            print("\n" + "="*60)
+            print("\n" + RULE)
             print("SIMULATION COMPLETED SUCCESSFULLY")
-            print("="*60)
+            print(RULE)
             print(f"Duration: {metrics.duration_seconds:.1f} seconds")
             print(f"Total Steps: {metrics.total_steps}")
             print(f"Total Actions: {metrics.total_actions}")
@@ -155,7 +166,7 @@ def run_simulation_with_config(config: ClientSimulationConfig) -> int:
             print(f"Actions per Minute: {metrics.actions_per_minute:.1f}")
             print(f"Average Response Time: {metrics.average_response_time:.3f}s")
             print(f"\nResults saved to: {config.output_directory}")
-            print("="*60)
+            print(RULE)
             
             return 0
             
@@ -171,11 +182,15 @@ def run_simulation_with_config(config: ClientSimulationConfig) -> int:
         print(f"\nERROR: Simulation failed - {str(e)}")
         return 1
 
-def main():
-    """Main entry point."""
+def build_parser() -> 'argparse.ArgumentParser':
+    """Build the command line parser."""
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description="GaaS Multi-Agent Client Simulation",
         formatter_class=argparse.RawDescriptionHelpFormatter,
+        # Options left off the command line keep the config's own value
+        argument_default=argparse.SUPPRESS,
         epilog="""
 Examples:
   # Run with default settings
@@ -195,58 +210,56 @@ Examples:
         """
     )
     
-    # Backend connection arguments
-    parser.add_argument("--backend-host", default="localhost",
+    # Backend connection arguments; each option's dest is the config field it sets
+    parser.add_argument("--backend-host",
                        help="Backend host (default: localhost)")
-    parser.add_argument("--backend-port", type=int, default=8000,
+    parser.add_argument("--backend-port", type=int,
                        help="Backend port (default: 8000)")
-    parser.add_argument("--backend-protocol", default="http",
+    parser.add_argument("--backend-protocol",
                        choices=["http", "https"],
                        help="Backend protocol (default: http)")
     
     # Simulation arguments
-    parser.add_argument("--duration", type=int, default=30,
+    parser.add_argument("--duration", type=int,
+                       dest="simulation_duration_minutes", metavar="DURATION",
                        help="Simulation duration in minutes (default: 30)")
-    parser.add_argument("--agents", type=int, default=15,
+    parser.add_argument("--agents", type=int,
+                       dest="num_agents", metavar="AGENTS",
                        help="Number of agents to simulate (default: 15)")
-    parser.add_argument("--interval", type=float, default=2.0,
+    parser.add_argument("--interval", type=float,
+                       dest="step_interval_seconds", metavar="INTERVAL",
                        help="Step interval in seconds (default: 2.0)")
-    parser.add_argument("--max-concurrent", type=int, default=5,
+    parser.add_argument("--max-concurrent", type=int,
+                       dest="max_concurrent_agents", metavar="MAX_CONCURRENT",
                        help="Maximum concurrent agents (default: 5)")
     
     # Output arguments
-    parser.add_argument("--output-dir", default="./simulation_results",
+    parser.add_argument("--output-dir",
+                       dest="output_directory", metavar="OUTPUT_DIR",
                        help="Output directory (default: ./simulation_results)")
-    parser.add_argument("--log-level", default="INFO",
+    parser.add_argument("--log-level",
                        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
                        help="Logging level (default: INFO)")
-    parser.add_argument("--log-file", default="client_simulation.log",
+    parser.add_argument("--log-file",
                        help="Log file path (default: client_simulation.log)")
     
     # Configuration source
-    parser.add_argument("--use-env", action="store_true",
+    parser.add_argument("--use-env", action="store_true", default=False,
                        help="Load configuration from environment variables")
     
-    args = parser.parse_args()
+    return parser
+
+def main():
+    """Main entry point."""
+    # Without arguments there is nothing to override, so argparse is not needed
+    overrides = vars(build_parser().parse_args()) if len(sys.argv) > 1 else {}
     
-    # Create configuration
-    if args.use_env:
-        config = ClientSimulationConfig.from_environment()
+    # Create configuration, overriding only the options given on the command line
+    if overrides.pop('use_env', False):
+        config = dataclasses.replace(ClientSimulationConfig.from_environment(), **overrides)
         print("Using configuration from environment variables")
     else:
-        config = ClientSimulationConfig()
-    
-    # Override with command line arguments
-    config.backend_host = args.backend_host
-    config.backend_port = args.backend_port
-    config.backend_protocol = args.backend_protocol
-    config.simulation_duration_minutes = args.duration
-    config.num_agents = args.agents
-    config.step_interval_seconds = args.interval
-    config.max_concurrent_agents = args.max_concurrent
-    config.output_directory = args.output_dir
-    config.log_level = args.log_level
-    config.log_file = args.log_file
+        config = ClientSimulationConfig(**overrides)
     
     # Setup logging
     setup_logging(config)
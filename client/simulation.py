@@ -3,6 +3,8 @@ Main simulation loop for multi-agent GaaS system testing.
 This module orchestrates agent interactions and manages the simulation lifecycle.
 """
 
+import asyncio
+import multiprocessing
 import time
 import json
 import csv
@@ -14,7 +16,10 @@ from dataclasses import dataclass, asdict
 import logging
 
 from client_interface import GaaSClient, ClientConfig
-from agents import BaseAgent, create_agent_population
+from agents import (
+    BaseAgent, create_agent_population, simulate_population_step,
+    init_worker, run_population_parallel, PARALLEL_MIN_AGENTS
+)
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +29,12 @@ class SimulationConfig:
     duration_minutes: int = 30
     step_interval_seconds: float = 2.0
     max_concurrent_agents: int = 5
+    # Step agents as coroutines on one event loop instead of on a thread pool
+    async_agents: bool = True
+    # Send all agents' decisions, then all their action logs, as one /batch request each
+    batch_requests: bool = True
+    # Shard agents across this many processes, each with its own client; 0 or 1 keeps them here
+    worker_processes: int = 0
     log_interval_steps: int = 10
     backend_url: str = "http://localhost:8000"
     output_directory: str = "./simulation_results"
@@ -118,7 +129,8 @@ class PerformanceLogger:
             "blocked_actions": agent.metrics.blocked_actions,
             "warnings_received": agent.metrics.warnings_received,
             "compliance_rate": agent.metrics.compliance_rate,
-            "average_response_time": agent.metrics.average_response_time
+            "average_response_time": agent.metrics.average_response_time,
+            "response_time_stddev": agent.metrics.response_time_stddev
         }
         self.agent_metrics_logs.append(log_entry)
     
@@ -166,6 +178,11 @@ class GaaSSimulation:
         self.performance_logger = PerformanceLogger(self.config.output_directory)
         self.running = False
         self.step_count = 0
+        # Event loop that drives the agents when async_agents is set; kept for the
+        # whole run so the client's async session and its connections are reused
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Worker processes used when worker_processes > 1; started on first use
+        self._pool = None
         
     def initialize_agents(self, num_agents: int = 15) -> bool:
         """Initialize and register all agents."""
@@ -175,11 +192,14 @@ class GaaSSimulation:
         self.agents = create_agent_population(self.client, num_agents)
         
         # Register all agents
-        registration_success = 0
-        for agent in self.agents:
-            if agent.register():
-                registration_success += 1
-                time.sleep(0.1)  # Small delay between registrations
+        if self.config.async_agents:
+            registration_success = sum(self._run_async(self._aregister_agents()))
+        else:
+            registration_success = 0
+            for agent in self.agents:
+                if agent.register():
+                    registration_success += 1
+                    time.sleep(0.1)  # Small delay between registrations
         
         self.metrics.agents_registered = registration_success
         logger.info(f"Successfully registered {registration_success}/{len(self.agents)} agents")
@@ -196,65 +216,124 @@ class GaaSSimulation:
             logger.error(f"Backend health check failed: {str(e)}")
             return False
     
+    async def _aregister_agents(self) -> List[bool]:
+        """Register all agents concurrently."""
+        return list(await asyncio.gather(*(agent.aregister() for agent in self.agents)))
+    
+    def _run_async(self, coroutine):
+        """Run a coroutine to completion on the simulation's event loop."""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coroutine)
+    
     def execute_agent_step(self, agent: BaseAgent) -> Dict[str, Any]:
         """Execute one simulation step for a single agent."""
         try:
             step_start_time = datetime.now()
             result = agent.simulate_step()
+            self._record_step_result(agent, result, step_start_time)
+            return result
             
-            # Log the step results
-            if result.get("action_executed"):
-                action_data = result.get("action_generated", {})
-                action_result = result.get("action_result", {})
-                
-                self.performance_logger.log_action(
-                    agent.agent_id, action_data, action_result, step_start_time
-                )
-                
-                # Update simulation metrics
-                self.metrics.total_actions += 1
-                if action_result.get("violations_detected"):
-                    self.metrics.total_violations += len(action_result["violations_detected"])
-            
-            # Log enforcement decision
-            enforcement_decision = result.get("enforcement_decision", {})
-            if enforcement_decision:
-                decision = enforcement_decision.get("decision", "unknown")
-                violations = enforcement_decision.get("violations", [])
-                
-                self.performance_logger.log_enforcement_decision(
-                    agent.agent_id,
-                    result.get("action_generated", {}).get("description", ""),
-                    decision,
-                    violations,
-                    step_start_time
-                )
-                
-                # Update metrics based on decision
-                if decision == "block":
-                    self.metrics.total_blocks += 1
-                elif decision == "warn":
-                    self.metrics.total_warnings += 1
-            
+        except Exception as e:
+            logger.error(f"Error executing step for agent {agent.agent_id}: {str(e)}")
+            return {"error": str(e), "agent_id": agent.agent_id}
+    
+    async def aexecute_agent_step(self, agent: BaseAgent, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Async version of execute_agent_step."""
+        try:
+            async with semaphore:
+                step_start_time = datetime.now()
+                result = await agent.asimulate_step()
+            self._record_step_result(agent, result, step_start_time)
             return result
             
         except Exception as e:
             logger.error(f"Error executing step for agent {agent.agent_id}: {str(e)}")
             return {"error": str(e), "agent_id": agent.agent_id}
     
-    def execute_simulation_step(self):
-        """Execute one simulation step for all active agents."""
-        active_agents = [agent for agent in self.agents if agent.active and agent.registered]
+    def _record_step_result(self, agent: BaseAgent, result: Dict[str, Any], step_start_time: datetime):
+        """Log one agent step and add it to the simulation metrics."""
+        # Log the step results
+        if result.get("action_executed"):
+            action_data = result.get("action_generated", {})
+            action_result = result.get("action_result", {})
+            
+            self.performance_logger.log_action(
+                agent.agent_id, action_data, action_result, step_start_time
+            )
+            
+            # Update simulation metrics
+            self.metrics.total_actions += 1
+            if action_result.get("violations_detected"):
+                self.metrics.total_violations += len(action_result["violations_detected"])
         
-        if not active_agents:
-            logger.warning("No active agents available for simulation step")
-            return
+        # Log enforcement decision
+        enforcement_decision = result.get("enforcement_decision", {})
+        if enforcement_decision:
+            decision = enforcement_decision.get("decision", "unknown")
+            violations = enforcement_decision.get("violations", [])
+            
+            self.performance_logger.log_enforcement_decision(
+                agent.agent_id,
+                result.get("action_generated", {}).get("description", ""),
+                decision,
+                violations,
+                step_start_time
+            )
+            
+            # Update metrics based on decision
+            if decision == "block":
+                self.metrics.total_blocks += 1
+            elif decision == "warn":
+                self.metrics.total_warnings += 1
+    
+    def _execute_agent_steps_parallel(self, agents: List[BaseAgent]) -> List[Dict[str, Any]]:
+        """Step agents in worker processes, one batched step per shard."""
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.config.worker_processes, initializer=init_worker,
+                                              initargs=(self.client_config,))
         
-        # Execute agent steps concurrently
+        try:
+            step_start_time = datetime.now()
+            updated_agents, (step_results,) = run_population_parallel(
+                agents, self._pool, self.config.worker_processes
+            )
+        except Exception as e:
+            logger.error(f"Parallel simulation step failed: {str(e)}")
+            return []
+        
+        # Workers return updated copies of the agents; swap them in
+        agents_by_id = {agent.agent_id: agent for agent in updated_agents}
+        for agent in updated_agents:
+            agent.client = self.client
+        self.agents = [agents_by_id.get(agent.agent_id, agent) for agent in self.agents]
+        
+        for result in step_results:
+            self._record_step_result(agents_by_id[result["agent_id"]], result, step_start_time)
+        
+        return step_results
+    
+    def _execute_agent_steps_batched(self, agents: List[BaseAgent]) -> List[Dict[str, Any]]:
+        """Step all agents together, with one batched backend call per phase."""
+        try:
+            step_start_time = datetime.now()
+            step_results = simulate_population_step(agents, self.client)
+        except Exception as e:
+            logger.error(f"Batched simulation step failed: {str(e)}")
+            return []
+        
+        agents_by_id = {agent.agent_id: agent for agent in agents}
+        for result in step_results:
+            self._record_step_result(agents_by_id[result["agent_id"]], result, step_start_time)
+        
+        return step_results
+    
+    def _execute_agent_steps_threaded(self, agents: List[BaseAgent]) -> List[Dict[str, Any]]:
+        """Step agents on a thread pool of max_concurrent_agents workers."""
         with ThreadPoolExecutor(max_workers=self.config.max_concurrent_agents) as executor:
             future_to_agent = {
-                executor.submit(self.execute_agent_step, agent): agent 
-                for agent in active_agents
+                executor.submit(self.execute_agent_step, agent): agent
+                for agent in agents
             }
             
             step_results = []
@@ -266,14 +345,43 @@ class GaaSSimulation:
                 except Exception as e:
                     logger.error(f"Agent {agent.agent_id} step failed: {str(e)}")
         
+        return step_results
+    
+    async def _aexecute_agent_steps(self, agents: List[BaseAgent]) -> List[Dict[str, Any]]:
+        """Step agents as coroutines, at most max_concurrent_agents awaiting the backend at once."""
+        semaphore = asyncio.Semaphore(self.config.max_concurrent_agents)
+        return list(await asyncio.gather(
+            *(self.aexecute_agent_step(agent, semaphore) for agent in agents)
+        ))
+    
+    def execute_simulation_step(self):
+        """Execute one simulation step for all active agents."""
+        active_agents = [agent for agent in self.agents if agent.active and agent.registered]
+        
+        if not active_agents:
+            logger.warning("No active agents available for simulation step")
+            return
+        
+        # Execute agent steps concurrently
+        if self.config.worker_processes > 1 and len(active_agents) >= PARALLEL_MIN_AGENTS:
+            step_results = self._execute_agent_steps_parallel(active_agents)
+        elif self.config.batch_requests:
+            step_results = self._execute_agent_steps_batched(active_agents)
+        elif self.config.async_agents:
+            step_results = self._run_async(self._aexecute_agent_steps(active_agents))
+        else:
+            step_results = self._execute_agent_steps_threaded(active_agents)
+        
         self.step_count += 1
         self.metrics.total_steps += 1
         
         # Log agent metrics periodically
         if self.step_count % self.config.log_interval_steps == 0:
             timestamp = datetime.now()
-            for agent in active_agents:
-                self.performance_logger.log_agent_metrics(agent, timestamp)
+            # Re-read the agents: a parallel step replaces them with updated copies
+            for agent in self.agents:
+                if agent.active and agent.registered:
+                    self.performance_logger.log_agent_metrics(agent, timestamp)
             
             logger.info(f"Completed step {self.step_count}: "
                        f"{len(step_results)} agents active, "
@@ -317,12 +425,12 @@ class GaaSSimulation:
             self.metrics.simulation_end_time = datetime.now()
             
             # Calculate final metrics
-            all_response_times = []
-            for agent in self.agents:
-                all_response_times.extend(agent.metrics.response_times)
-            
-            if all_response_times:
-                self.metrics.average_response_time = sum(all_response_times) / len(all_response_times)
+            # Combine the agents' running means, weighted by their sample counts
+            response_count = sum(agent.metrics.rt_count for agent in self.agents)
+            if response_count:
+                self.metrics.average_response_time = sum(
+                    agent.metrics.rt_mean * agent.metrics.rt_count for agent in self.agents
+                ) / response_count
             
             logger.info("Simulation completed successfully")
             
@@ -379,6 +487,14 @@ class GaaSSimulation:
         """Clean up resources."""
         if self.client:
             self.client.close()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        if self._loop is not None:
+            self._loop.run_until_complete(self.client.aclose())
+            self._loop.close()
+            self._loop = None
 
 def main():
     """Main entry point for running the simulation."""